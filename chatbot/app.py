@@ -1,26 +1,49 @@
 import os
 import uuid
+import time
+import asyncio
 import json
-from fastapi import FastAPI, UploadFile, Form, File
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+import orjson
+import hashlib
+import msgspec
+from fastapi import FastAPI, UploadFile, Form, File, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
-import requests
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 import re
 from dotenv import load_dotenv
 load_dotenv()  # Add this line right after imports
 
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional - caching is skipped without it
+    redis = None
+
 # Groq API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
+# Response cache configuration (disabled when REDIS_URL is not set)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL_SECONDS = 86400
+redis_client = redis.Redis.from_url(REDIS_URL) if redis and REDIS_URL else None
+
+# Fallback replies returned by call_groq_api when Groq fails (never cached)
+GROQ_UNAVAILABLE_MESSAGE = "I'm having trouble processing your request right now. Please try again later."
+GROQ_UNEXPECTED_MESSAGE = "I received an unexpected response. Please try again."
+
+# Max /chat/batch items processed at once across all batch requests
+BATCH_CONCURRENCY = 20
+batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
 # Remove Vertex AI initialization
 # os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/app/key.json"  # Optional: Remove if not needed for other GCP services
 
-app = FastAPI(title="Enhanced Career Chatbot", version="2.0.0")
+app = FastAPI(title="Enhanced Career Chatbot", version="2.0.0", default_response_class=ORJSONResponse)
 
 
 app.add_middleware(
@@ -155,30 +178,122 @@ knowledge_base = {
     ]
 }
 
-# Request Models
-class ChatRequest(BaseModel):
+# Static knowledge base pieces precomputed once instead of per request
+WEBSITE_INFO_JSON = json.dumps(knowledge_base["website_info"], separators=(",", ":"))
+# "path":{...} fragment per page, joined per request for only the relevant pages
+PAGE_JSON_FRAGMENTS = {
+    page: json.dumps({page: info}, separators=(",", ":"))[1:-1]
+    for page, info in knowledge_base["pages"].items()
+}
+MAX_CONTEXT_PAGES = 2
+
+MAIN_MENU_RESPONSE = {
+    "type": "options",
+    "message": knowledge_base["main_menu"]["greeting"],
+    "options": knowledge_base["main_menu"]["options"],
+    "confidence": 100
+}
+
+# Map keywords in user text to suggested pages
+KEYWORD_TO_PAGE = {
+    "skill": "/skills-analysis",
+    "resume": "/resume-builder",
+    "cv": "/resume-builder",
+    "job": "/job-market",
+    "career": "/career-paths",
+    "path": "/career-paths",
+    "mentor": "/mentorship",
+    "community": "/community",
+    "profile": "/profile",
+    "ats": "/ats",
+    "dashboard": "/dashboard"
+}
+# Leading word boundary only, so plurals like "skills" or "jobs" still match
+KEYWORD_RE = re.compile(r"\b(" + "|".join(map(re.escape, KEYWORD_TO_PAGE)) + ")")
+
+# Request Models (msgspec validates request bodies in C on the hot path)
+class ChatRequest(msgspec.Struct):
     message: Optional[str] = None
     option_id: Optional[str] = None
     current_page: Optional[str] = None
     input_type: str = "text"
 
-class OptionResponse(BaseModel):
-    type: str = "options"
-    message: str
-    options: List[Dict[str, Any]]
-    confidence: int = 100
+async def decode_chat_request(request: Request) -> ChatRequest:
+    try:
+        return msgspec.json.decode(await request.body(), type=ChatRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-# Groq AI Helper Function
-def call_groq_api(prompt: str, model: str = "llama-3.1-8b-instant") -> str:
-    """
-    Call Groq API with the given prompt
-    """
-    headers = {
+async def decode_chat_requests(request: Request) -> List[ChatRequest]:
+    try:
+        return msgspec.json.decode(await request.body(), type=List[ChatRequest])
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+# Shared Groq HTTP client (connection pool reused across requests)
+@app.on_event("startup")
+async def startup_groq_client():
+    app.state.groq_client = httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
+        transport=httpx.AsyncHTTPTransport(retries=2),
+    )
+
+@app.on_event("shutdown")
+async def shutdown_groq_client():
+    await app.state.groq_client.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
+
+# Response timestamp, reformatted once a second instead of on every request
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+cached_timestamp = time.strftime(TIMESTAMP_FORMAT, time.gmtime())
+
+async def refresh_cached_timestamp():
+    global cached_timestamp
+    while True:
+        cached_timestamp = time.strftime(TIMESTAMP_FORMAT, time.gmtime())
+        await asyncio.sleep(1)
+
+@app.on_event("startup")
+async def start_timestamp_refresh():
+    app.state.timestamp_task = asyncio.create_task(refresh_cached_timestamp())
+
+@app.on_event("shutdown")
+async def stop_timestamp_refresh():
+    app.state.timestamp_task.cancel()
+
+# Response cache helpers - cache failures never break a request
+async def cache_get(key: str) -> Optional[str]:
+    if redis_client is None:
+        return None
+    try:
+        value = await redis_client.get(key)
+        return value.decode() if value is not None else None
+    except redis.RedisError as e:
+        logging.warning(f"Redis get failed: {e}")
+        return None
+
+async def cache_set(key: str, value: str, ttl: int = CACHE_TTL_SECONDS):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(key, ttl, value)
+    except redis.RedisError as e:
+        logging.warning(f"Redis set failed: {e}")
+
+# Groq AI Helper Functions
+inflight_groq_calls: Dict[str, asyncio.Task] = {}
+
+def groq_headers() -> Dict[str, str]:
+    return {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
-    
-    payload = {
+
+def groq_payload(prompt: str, model: str, stream: bool = False) -> Dict[str, Any]:
+    return {
         "messages": [
             {
                 "role": "user",
@@ -189,124 +304,210 @@ def call_groq_api(prompt: str, model: str = "llama-3.1-8b-instant") -> str:
         "temperature": 0.7,
         "max_tokens": 1024,
         "top_p": 0.9,
-        "stream": False
+        "stream": stream
     }
-    
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
+
+# Bound concurrent Groq calls per process; retry rate limits and server errors
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "30"))
+groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+def is_retryable_groq_error(error: BaseException) -> bool:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    status = error.response.status_code
+    return status == 429 or status >= 500
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=4),
+    retry=retry_if_exception(is_retryable_groq_error),
+    reraise=True,
+)
+async def post_to_groq(client: httpx.AsyncClient, headers, body: bytes) -> httpx.Response:
+    async with groq_semaphore:
+        response = await client.post(GROQ_API_URL, headers=headers, content=body)
+    response.raise_for_status()
+    return response
+
+async def stream_groq_api(client: httpx.AsyncClient, prompt: str, model: str = "llama-3.1-8b-instant"):
+    """
+    Stream a Groq completion, yielding content deltas as they arrive
+    """
+    payload = groq_payload(prompt, model, stream=True)
+    async with groq_semaphore, client.stream(
+        "POST", GROQ_API_URL, headers=groq_headers(), content=orjson.dumps(payload)
+    ) as response:
         response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            content = json.loads(data)["choices"][0]["delta"].get("content")
+            if content:
+                yield content
+
+async def call_groq_api(client: httpx.AsyncClient, prompt: str, model: str = "llama-3.1-8b-instant") -> str:
+    """
+    Call Groq API with the given prompt, serving repeated prompts from cache
+    """
+    cache_key = "groq:" + hashlib.sha256((model + prompt).encode()).hexdigest()
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Identical prompts already in flight share one Groq call
+    task = inflight_groq_calls.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(request_groq_completion(client, prompt, model, cache_key))
+        inflight_groq_calls[cache_key] = task
+        task.add_done_callback(lambda _: inflight_groq_calls.pop(cache_key, None))
+    return await asyncio.shield(task)
+
+async def request_groq_completion(client: httpx.AsyncClient, prompt: str, model: str, cache_key: str) -> str:
+    try:
+        body = orjson.dumps(groq_payload(prompt, model))
+        response = await post_to_groq(client, groq_headers(), body)
         
         result = response.json()
-        return result["choices"][0]["message"]["content"]
+        content = result["choices"][0]["message"]["content"]
+        await cache_set(cache_key, content)
+        return content
     
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Groq API error: {e}")
-        return "I'm having trouble processing your request right now. Please try again later."
+        return GROQ_UNAVAILABLE_MESSAGE
     
     except (KeyError, IndexError) as e:
         logging.error(f"Unexpected response format from Groq API: {e}")
-        return "I received an unexpected response. Please try again."
+        return GROQ_UNEXPECTED_MESSAGE
 
 # Helper Functions (updated to use Groq)
 def get_main_menu():
+    return MAIN_MENU_RESPONSE
+
+def build_navigation_response(option: Dict[str, Any]):
+    page_info = knowledge_base["pages"].get(option["page"], {})
     return {
-        "type": "options",
-        "message": knowledge_base["main_menu"]["greeting"],
-        "options": knowledge_base["main_menu"]["options"],
-        "confidence": 100
+        "type": "navigation",
+        "message": f"🧭 Taking you to **{page_info.get('name', 'page')}**...\n\n{page_info.get('description', 'Loading...')}",
+        "page": option["page"],
+        "confidence": 95,
+        "follow_up_options": [
+            {"id": "main_menu", "text": "🏠 Main Menu"},
+            {"id": "navigate_pages", "text": "🧭 Go Somewhere Else"}
+        ]
     }
 
+# Option responses are static, so they are built once and shared (never mutated)
+NAVIGATION_RESPONSES = {
+    opt["id"]: build_navigation_response(opt) for opt in knowledge_base["navigate_options"]
+}
+
+PAGE_NOT_FOUND_RESPONSE = {"type": "error", "message": "Page not found", "confidence": 0}
+
+EXPLORE_FEATURES_RESPONSE = {
+    "type": "options", 
+    "message": "🔍 **Platform Features** - What would you like to explore?",
+    "options": [
+        {"id": "feature_career", "text": "🎯 Career Development Tools", "description": "Career planning and guidance"},
+        {"id": "feature_analysis", "text": "📊 Analysis Tools", "description": "Skills and resume analysis"},
+        {"id": "feature_networking", "text": "🤝 Networking Tools", "description": "Mentorship and community"},
+        {"id": "main_menu", "text": "⬅️ Back to Main Menu"}
+    ],
+    "confidence": 98
+}
+
+CAREER_HELP_RESPONSE = {
+    "type": "advice",
+    "message": "💼 **Career Guidance Available:**\n\n• **Career Planning** - Set goals and create roadmaps\n• **Skill Development** - Identify gaps and learning paths\n• **Job Search** - Market insights and opportunities\n• **Resume Optimization** - ATS-friendly resume building\n• **Interview Prep** - Practice and feedback\n\nWhat specific area would you like help with?",
+    "confidence": 95,
+    "follow_up_options": [
+        {"id": "go_career_paths", "text": "🛤️ Explore Careers"},
+        {"id": "go_skills", "text": "🎯 Analyze Skills"},
+        {"id": "go_resume", "text": "📄 Build Resume"},
+        {"id": "main_menu", "text": "🏠 Main Menu"}
+    ]
+}
+
+QUICK_ACTIONS_RESPONSE = {
+    "type": "options",
+    "message": "⚡ **Quick Actions** - Popular features:",
+    "options": [
+        {"id": "go_skills", "text": "🎯 Skills Assessment", "description": "Evaluate your abilities"},
+        {"id": "go_ats", "text": "📊 Check Resume ATS", "description": "ATS compatibility check"},
+        {"id": "go_jobs", "text": "💼 Browse Jobs", "description": "Current opportunities"},
+        {"id": "go_dashboard", "text": "📈 View Progress", "description": "Your career dashboard"},
+        {"id": "main_menu", "text": "⬅️ Back to Main Menu"}
+    ],
+    "confidence": 100
+}
+
+UNKNOWN_OPTION_RESPONSE = {
+    "type": "error",
+    "message": "I didn't understand that option. Let me show you the main menu.",
+    "confidence": 0,
+    "follow_up_options": [{"id": "main_menu", "text": "🏠 Main Menu"}]
+}
+
 def handle_navigation_option(option_id: str):
-    nav_options = knowledge_base["navigate_options"]
-    selected = next((opt for opt in nav_options if opt["id"] == option_id), None)
-    
-    if selected:
-        page_info = knowledge_base["pages"].get(selected["page"], {})
-        return {
-            "type": "navigation",
-            "message": f"🧭 Taking you to **{page_info.get('name', 'page')}**...\n\n{page_info.get('description', 'Loading...')}",
-            "page": selected["page"],
-            "confidence": 95,
-            "follow_up_options": [
-                {"id": "main_menu", "text": "🏠 Main Menu"},
-                {"id": "navigate_pages", "text": "🧭 Go Somewhere Else"}
-            ]
-        }
-    
-    return {"type": "error", "message": "Page not found", "confidence": 0}
+    return NAVIGATION_RESPONSES.get(option_id, PAGE_NOT_FOUND_RESPONSE)
+
+NAVIGATE_PAGES_OPTIONS = tuple(
+    {"id": opt["id"], "text": opt["text"], "description": f"Go to {opt['text']}"}
+    for opt in knowledge_base["navigate_options"]
+) + ({"id": "main_menu", "text": "⬅️ Back to Main Menu"},)
+
+NAVIGATE_PAGES_RESPONSE = {
+    "type": "options",
+    "message": "🧭 **Quick Navigation** - Where would you like to go?",
+    "options": NAVIGATE_PAGES_OPTIONS,
+    "confidence": 100
+}
+
+# Option id -> static response, looked up once per click instead of an elif chain
+OPTION_RESPONSES = {
+    "main_menu": MAIN_MENU_RESPONSE,
+    "navigate_pages": NAVIGATE_PAGES_RESPONSE,
+    "explore_features": EXPLORE_FEATURES_RESPONSE,
+    "career_help": CAREER_HELP_RESPONSE,
+    "quick_actions": QUICK_ACTIONS_RESPONSE
+}
 
 def handle_option_selection(option_id: str):
-    if option_id == "main_menu":
-        return get_main_menu()
+    response = OPTION_RESPONSES.get(option_id)
+    if response:
+        return response
     
-    elif option_id == "navigate_pages":
-        return {
-            "type": "options",
-            "message": "🧭 **Quick Navigation** - Where would you like to go?",
-            "options": [
-                {"id": opt["id"], "text": opt["text"], "description": f"Go to {opt['text']}"} 
-                for opt in knowledge_base["navigate_options"]
-            ] + [{"id": "main_menu", "text": "⬅️ Back to Main Menu"}],
-            "confidence": 100
-        }
-    
-    elif option_id.startswith("go_"):
+    if option_id.startswith("go_"):
         return handle_navigation_option(option_id)
     
-    elif option_id == "explore_features":
-        return {
-            "type": "options", 
-            "message": "🔍 **Platform Features** - What would you like to explore?",
-            "options": [
-                {"id": "feature_career", "text": "🎯 Career Development Tools", "description": "Career planning and guidance"},
-                {"id": "feature_analysis", "text": "📊 Analysis Tools", "description": "Skills and resume analysis"},
-                {"id": "feature_networking", "text": "🤝 Networking Tools", "description": "Mentorship and community"},
-                {"id": "main_menu", "text": "⬅️ Back to Main Menu"}
-            ],
-            "confidence": 98
-        }
-    
-    elif option_id == "career_help":
-        return {
-            "type": "advice",
-            "message": "💼 **Career Guidance Available:**\n\n• **Career Planning** - Set goals and create roadmaps\n• **Skill Development** - Identify gaps and learning paths\n• **Job Search** - Market insights and opportunities\n• **Resume Optimization** - ATS-friendly resume building\n• **Interview Prep** - Practice and feedback\n\nWhat specific area would you like help with?",
-            "confidence": 95,
-            "follow_up_options": [
-                {"id": "go_career_paths", "text": "🛤️ Explore Careers"},
-                {"id": "go_skills", "text": "🎯 Analyze Skills"},
-                {"id": "go_resume", "text": "📄 Build Resume"},
-                {"id": "main_menu", "text": "🏠 Main Menu"}
-            ]
-        }
-    
-    elif option_id == "quick_actions":
-        return {
-            "type": "options",
-            "message": "⚡ **Quick Actions** - Popular features:",
-            "options": [
-                {"id": "go_skills", "text": "🎯 Skills Assessment", "description": "Evaluate your abilities"},
-                {"id": "go_ats", "text": "📊 Check Resume ATS", "description": "ATS compatibility check"},
-                {"id": "go_jobs", "text": "💼 Browse Jobs", "description": "Current opportunities"},
-                {"id": "go_dashboard", "text": "📈 View Progress", "description": "Your career dashboard"},
-                {"id": "main_menu", "text": "⬅️ Back to Main Menu"}
-            ],
-            "confidence": 100
-        }
-    
-    else:
-        return {
-            "type": "error",
-            "message": "I didn't understand that option. Let me show you the main menu.",
-            "confidence": 0,
-            "follow_up_options": [{"id": "main_menu", "text": "🏠 Main Menu"}]
-        }
+    return UNKNOWN_OPTION_RESPONSE
+
+def select_relevant_pages(text: str, current_page: str = None) -> List[str]:
+    """Pick the pages whose keywords appear in the text, plus the current page"""
+    pages = []
+    for match in KEYWORD_RE.finditer(text.lower()):
+        page = KEYWORD_TO_PAGE[match.group(1)]
+        if page not in pages:
+            pages.append(page)
+    if current_page in knowledge_base["pages"] and current_page not in pages:
+        pages.append(current_page)
+    return pages[:MAX_CONTEXT_PAGES]
 
-def process_text_with_groq(text: str, current_page: str = None):
-    context = f"""
+def build_advisor_prompt(text: str, current_page: str = None) -> str:
+    relevant_pages = select_relevant_pages(text, current_page)
+    pages_context = ""
+    if relevant_pages:
+        pages_json = "{" + ",".join(PAGE_JSON_FRAGMENTS[page] for page in relevant_pages) + "}"
+        pages_context = f"RELEVANT PAGES: {pages_json}"
+
+    return f"""
     You are an AI career advisor for Student Advisor Portal, a comprehensive career guidance platform.
     
-    WEBSITE INFO: {json.dumps(knowledge_base['website_info'])}
-    AVAILABLE PAGES: {json.dumps(knowledge_base['pages'])}
+    WEBSITE INFO: {WEBSITE_INFO_JSON}
+    {pages_context}
     
     USER QUESTION: {text}
     CURRENT PAGE: {current_page or 'Unknown'}
@@ -315,32 +516,23 @@ def process_text_with_groq(text: str, current_page: str = None):
     If relevant, suggest specific platform features or pages that could help the user.
     Focus on career development, skills, job search, resumes, and professional growth.
     """
+
+async def process_text_with_groq(client: httpx.AsyncClient, text: str, current_page: str = None):
+    cache_key = "chat:" + hashlib.sha256(json.dumps([text, current_page]).encode()).hexdigest()
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    context = build_advisor_prompt(text, current_page)
     
     try:
-        response_text = call_groq_api(context)
+        response_text = await call_groq_api(client, context)
         
         # Extract page suggestions based on content
         suggested_pages = []
-        text_lower = text.lower()
-        
-        # Map keywords to pages
-        keyword_to_page = {
-            "skill": "/skills-analysis",
-            "resume": "/resume-builder",
-            "cv": "/resume-builder", 
-            "job": "/job-market",
-            "career": "/career-paths",
-            "path": "/career-paths",
-            "mentor": "/mentorship",
-            "community": "/community",
-            "profile": "/profile",
-            "ats": "/ats",
-            "dashboard": "/dashboard"
-        }
-        
-        for keyword, page in keyword_to_page.items():
-            if keyword in text_lower:
-                suggested_pages.append(page)
+        match = KEYWORD_RE.search(text.lower())
+        if match:
+            suggested_pages.append(KEYWORD_TO_PAGE[match.group(1)])
         
         result = {
             "type": "text",
@@ -358,6 +550,8 @@ def process_text_with_groq(text: str, current_page: str = None):
                 "label": f"Go to {page_info.get('name', page)}"
             }]
         
+        if response_text not in (GROQ_UNAVAILABLE_MESSAGE, GROQ_UNEXPECTED_MESSAGE):
+            await cache_set(cache_key, json.dumps(result))
         return result
         
     except Exception as e:
@@ -379,13 +573,14 @@ def root():
         "features": ["Option-based chat", "AI text processing", "Voice support", "Page navigation"],
         "endpoints": {
             "/chat/enhanced": "Enhanced chat with options",
+            "/chat/batch": "Several chat requests processed concurrently",
+            "/chat/stream": "Text chat streamed as server-sent events",
             "/voice": "Voice input processing", 
             "/chat/status": "Service status"
         }
     }
 
-@app.post("/chat/enhanced")
-def enhanced_chat(request: ChatRequest):
+async def handle_chat_request(request: ChatRequest):
     try:
         if request.input_type == "option" and request.option_id:
             if request.option_id == "main_menu" or not request.option_id:
@@ -394,7 +589,7 @@ def enhanced_chat(request: ChatRequest):
                 response = handle_option_selection(request.option_id)
         
         elif request.input_type == "text" and request.message:
-            response = process_text_with_groq(request.message, request.current_page)
+            response = await process_text_with_groq(app.state.groq_client, request.message, request.current_page)
         
         else:
             response = get_main_menu()
@@ -402,11 +597,11 @@ def enhanced_chat(request: ChatRequest):
         return {
             "success": True,
             "response": response,
-            "timestamp": "2024-01-01T00:00:00Z"
+            "timestamp": cached_timestamp
         }
         
     except Exception as e:
-        logging.error(f"Error in enhanced_chat: {e}")
+        logging.error(f"Error in handle_chat_request: {e}")
         return {
             "success": False,
             "response": {
@@ -416,6 +611,38 @@ def enhanced_chat(request: ChatRequest):
             }
         }
 
+@app.post("/chat/enhanced")
+async def enhanced_chat(request: ChatRequest = Depends(decode_chat_request)):
+    return await handle_chat_request(request)
+
+@app.post("/chat/batch")
+async def batch_chat(requests: List[ChatRequest] = Depends(decode_chat_requests)):
+    """Process several chat requests concurrently, bounded to avoid Groq 429s"""
+    async def handle_bounded(request: ChatRequest):
+        async with batch_semaphore:
+            return await handle_chat_request(request)
+
+    return await asyncio.gather(*[handle_bounded(request) for request in requests])
+
+@app.post("/chat/stream")
+async def stream_chat(request: ChatRequest = Depends(decode_chat_request)):
+    """Stream the AI answer to a text question as server-sent events"""
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    prompt = build_advisor_prompt(request.message, request.current_page)
+
+    async def event_stream():
+        try:
+            async for token in stream_groq_api(app.state.groq_client, prompt):
+                yield f"data: {json.dumps({'content': token})}\n\n"
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            logging.error(f"Groq streaming error: {e}")
+            yield f"data: {json.dumps({'error': GROQ_UNAVAILABLE_MESSAGE})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 
 @app.get("/chat/status")
@@ -438,4 +665,12 @@ def chat_status():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=False)
\ No newline at end of file
+    port = int(os.getenv("PORT", 8080))
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+    )
@@ -1,18 +1,36 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+import msgspec
 from mentor import tools
 import os
 import json
+import asyncio
+import orjson
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
 import uvicorn
-import requests
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional - caching is skipped without it
+    redis = None
+
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="Mentor API", description="AI Career Mentor with Tools")
+app = FastAPI(
+    title="Mentor API",
+    description="AI Career Mentor with Tools",
+    default_response_class=ORJSONResponse
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,47 +62,154 @@ app.add_middleware(
 # Groq API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "llama-3.1-8b-instant"  # You can change to "llama3-8b-8192" for faster responses
+
+# Response cache configuration (disabled when REDIS_URL is not set)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL_SECONDS = 86400
+redis_client = redis.Redis.from_url(REDIS_URL) if redis and REDIS_URL else None
 
-# Request models
-class ChatRequest(BaseModel):
+# Request models (msgspec validates and encodes in C on the hot path)
+class ChatRequest(msgspec.Struct):
     message: str
 
-class ChatResponse(BaseModel):
+class ChatResponse(msgspec.Struct):
     response: str
     status: str
 
-class HealthResponse(BaseModel):
+class HealthResponse(msgspec.Struct):
     status: str
     message: str
 
-class ToolInfo(BaseModel):
+class ToolInfo(msgspec.Struct):
     name: str
     description: str
 
-def call_groq_api(messages, tools=None, tool_choice=None):
-    """Call Groq API with the given messages and optional tools"""
-    headers = {
+async def decode_chat_request(request: Request) -> ChatRequest:
+    try:
+        return msgspec.json.decode(await request.body(), type=ChatRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def struct_response(struct: msgspec.Struct) -> Response:
+    return Response(content=msgspec.json.encode(struct), media_type="application/json")
+
+# Shared Groq HTTP client (connection pool reused across requests)
+@app.on_event("startup")
+async def startup_groq_client():
+    app.state.groq_client = httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
+        transport=httpx.AsyncHTTPTransport(retries=2),
+    )
+
+@app.on_event("shutdown")
+async def shutdown_groq_client():
+    await app.state.groq_client.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
+
+# Response cache helpers - cache failures never break a request
+async def cache_get(key: str):
+    if redis_client is None:
+        return None
+    try:
+        value = await redis_client.get(key)
+        return value.decode() if value is not None else None
+    except redis.RedisError as e:
+        logging.warning(f"Redis get failed: {e}")
+        return None
+
+async def cache_set(key: str, value: str, ttl: int = CACHE_TTL_SECONDS):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(key, ttl, value)
+    except redis.RedisError as e:
+        logging.warning(f"Redis set failed: {e}")
+
+def groq_headers():
+    return {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
-    
-    payload = {
+
+def groq_payload(messages, stream=False):
+    return {
         "messages": messages,
-        "model": "llama-3.1-8b-instant",  # You can change to "llama3-8b-8192" for faster responses
+        "model": GROQ_MODEL,
         "temperature": 0.7,
         "max_tokens": 1024,
         "top_p": 0.9,
-        "stream": False
+        "stream": stream
     }
+
+# Bound concurrent Groq calls per process; retry rate limits and server errors
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "30"))
+groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+def is_retryable_groq_error(error: BaseException) -> bool:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    status = error.response.status_code
+    return status == 429 or status >= 500
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=4),
+    retry=retry_if_exception(is_retryable_groq_error),
+    reraise=True,
+)
+async def post_to_groq(client: httpx.AsyncClient, headers, body: bytes) -> httpx.Response:
+    async with groq_semaphore:
+        response = await client.post(GROQ_API_URL, headers=headers, content=body)
+    response.raise_for_status()
+    return response
+
+async def stream_groq_api(client: httpx.AsyncClient, messages):
+    """Stream a Groq completion, yielding content deltas as they arrive"""
+    payload = groq_payload(messages, stream=True)
+    async with groq_semaphore, client.stream(
+        "POST", GROQ_API_URL, headers=groq_headers(), content=orjson.dumps(payload)
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            content = json.loads(data)["choices"][0]["delta"].get("content")
+            if content:
+                yield content
+
+inflight_groq_calls = {}
+
+async def call_groq_api(client: httpx.AsyncClient, messages, tools=None, tool_choice=None):
+    """Call Groq API with the given messages and optional tools"""
+    headers = groq_headers()
+    payload = groq_payload(messages)
     
     if tools:
         payload["tools"] = tools
         if tool_choice:
             payload["tool_choice"] = tool_choice
-    
+
+    body = orjson.dumps(payload)
+
+    # Identical requests already in flight share one Groq call
+    key = hashlib.sha256(body).hexdigest()
+    task = inflight_groq_calls.get(key)
+    if task is None:
+        task = asyncio.ensure_future(request_groq_completion(client, headers, body))
+        inflight_groq_calls[key] = task
+        task.add_done_callback(lambda _: inflight_groq_calls.pop(key, None))
+    return await asyncio.shield(task)
+
+async def request_groq_completion(client: httpx.AsyncClient, headers, body: bytes):
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
+        response = await post_to_groq(client, headers, body)
         return response.json()
     except Exception as e:
         raise Exception(f"Groq API error: {str(e)}")
@@ -99,7 +224,9 @@ async def root():
         "description": "AI Career Mentor powered by Groq",
         "endpoints": {
             "chat": "/chat",
+            "chat_stream": "/chat/stream",
             "health": "/health",
+            "health_deep": "/health/deep",
             "docs": "/docs",
             "openapi": "/openapi.json"
         },
@@ -107,13 +234,28 @@ async def root():
         "tools": ["web_search", "job_search", "wellness_guide", "calendar"]
     }
 
-@app.get("/health", response_model=HealthResponse)
+@app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint - local only, safe for frequent liveness probes"""
+    if GROQ_API_KEY:
+        return struct_response(HealthResponse(
+            status="healthy",
+            message="Mentor API is healthy - Groq API key configured"
+        ))
+    return struct_response(HealthResponse(
+        status="unhealthy",
+        message="Health check failed: Groq API key not configured"
+    ))
+
+# The deep check calls Groq, so its result is reused for a short while
+DEEP_HEALTH_TTL_SECONDS = 60
+deep_health_cache = {"expires_at": 0.0, "response": None}
+
+async def check_groq_connection() -> HealthResponse:
     try:
         # Test Groq API connection with a simple call
         test_messages = [{"role": "user", "content": "Hello"}]
-        response = call_groq_api(test_messages)
+        response = await call_groq_api(app.state.groq_client, test_messages)
         
         if response.get("choices"):
             return HealthResponse(
@@ -131,48 +273,74 @@ async def health_check():
             message=f"Health check failed: {str(e)}"
         )
 
+@app.get("/health/deep")
+async def deep_health_check():
+    """Health check that verifies the Groq connection (cached for 60 s)"""
+    now = time.monotonic()
+    if deep_health_cache["response"] is None or now >= deep_health_cache["expires_at"]:
+        deep_health_cache["response"] = await check_groq_connection()
+        deep_health_cache["expires_at"] = now + DEEP_HEALTH_TTL_SECONDS
+    return struct_response(deep_health_cache["response"])
+
+TOOL_KEYWORDS = [
+    'search', 'find', 'lookup', 'job', 'career', 'position', 'role',
+    'wellness', 'stress', 'anxiety', 'mental health', 'calm',
+    'calendar', 'schedule', 'meeting', 'appointment', 'invite',
+    'web', 'internet', 'online', 'latest', 'current', 'trend'
+]
+# Leading word boundary only, so "jobs" or "searching" still match
+TOOL_KEYWORDS_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, TOOL_KEYWORDS)) + ")")
+
 def should_use_tools(message: str) -> bool:
     """Determine if the message requires tool usage"""
-    tool_keywords = [
-        'search', 'find', 'lookup', 'job', 'career', 'position', 'role',
-        'wellness', 'stress', 'anxiety', 'mental health', 'calm',
-        'calendar', 'schedule', 'meeting', 'appointment', 'invite',
-        'web', 'internet', 'online', 'latest', 'current', 'trend'
-    ]
-    
-    message_lower = message.lower()
-    
-    # Check if message contains tool-related keywords
-    for keyword in tool_keywords:
-        if keyword in message_lower:
-            return True
-    
-    # Simple questions that don't need tools
-    simple_questions = [
-        'how are you', 'what is', 'who is', 'when is', 'where is',
-        'why', 'explain', 'tell me about', 'define', 'describe'
-    ]
-    
-    for question in simple_questions:
-        if message_lower.startswith(question):
-            return False
-    
-    return False
+    return bool(TOOL_KEYWORDS_RE.search(message.lower()))
 
-def get_fallback_response(message: str) -> str:
-    """Get response using Groq API for general questions"""
-    system_prompt = """You are a helpful AI career mentor assistant. Provide helpful, 
+FALLBACK_SYSTEM_PROMPT = """You are a helpful AI career mentor assistant. Provide helpful, 
     informative, and supportive responses to general questions. Be professional yet 
     friendly in your tone. If you don't know something, admit it honestly."""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
+
+def build_fallback_messages(message: str):
+    return [
+        {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
         {"role": "user", "content": message}
     ]
+
+# In-process LRU of fallback answers, checked before Redis
+FALLBACK_CACHE_MAXSIZE = 2048
+SENTENCE_PUNCTUATION = " .,!?;:'\"()"
+fallback_cache = OrderedDict()
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and trim surrounding sentence punctuation"""
+    return " ".join(message.lower().split()).strip(SENTENCE_PUNCTUATION)
+
+def remember_fallback(key: str, content: str):
+    fallback_cache[key] = content
+    fallback_cache.move_to_end(key)
+    if len(fallback_cache) > FALLBACK_CACHE_MAXSIZE:
+        fallback_cache.popitem(last=False)
+
+async def get_fallback_response(client: httpx.AsyncClient, message: str) -> str:
+    """Get response using Groq API for general questions"""
+    normalized = normalize_message(message)
+    if normalized in fallback_cache:
+        fallback_cache.move_to_end(normalized)
+        return fallback_cache[normalized]
+
+    cache_key = "groq:" + hashlib.sha256((GROQ_MODEL + FALLBACK_SYSTEM_PROMPT + normalized).encode()).hexdigest()
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        remember_fallback(normalized, cached)
+        return cached
+
+    messages = build_fallback_messages(message)
     
     try:
-        response = call_groq_api(messages)
-        return response["choices"][0]["message"]["content"]
+        response = await call_groq_api(client, messages)
+        content = response["choices"][0]["message"]["content"]
+        remember_fallback(normalized, content)
+        await cache_set(cache_key, content)
+        return content
     except Exception as e:
         return f"I apologize, but I'm having trouble processing your question right now. Error: {str(e)}"
 
@@ -202,11 +370,26 @@ def convert_tools_to_openai_format():
     
     return openai_tools
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Main chat endpoint"""
+# Tool definitions are static, so convert them once at import
+OPENAI_TOOLS = convert_tools_to_openai_format()
+TOOLS_BY_NAME = {tool.name: tool for tool in tools}
+
+async def run_tool_call(tool_call):
+    """Execute one tool call requested by the model (None if the tool is unknown)"""
+    tool_name = tool_call["function"]["name"]
+    tool = TOOLS_BY_NAME.get(tool_name)
+    if tool is None:
+        return None
+    tool_args = json.loads(tool_call["function"]["arguments"])
+    result = await tool.ainvoke(tool_args)
+    return f"{tool_name} result: {result}"
+
+async def generate_chat_response(request: ChatRequest) -> ChatResponse:
+    """Answer a chat message, using tools when the message calls for them"""
     if not GROQ_API_KEY:
         raise HTTPException(status_code=500, detail="Groq API key not configured")
+
+    client = app.state.groq_client
         
     try:
         message = request.message
@@ -217,28 +400,19 @@ async def chat(request: ChatRequest):
         # Check if we should use tools or fallback
         if should_use_tools(message):
             try:
-                # Convert tools to OpenAI format
-                openai_tools = convert_tools_to_openai_format()
-                
                 # First call to see if tools are needed
                 messages = [{"role": "user", "content": message}]
-                response = call_groq_api(messages, tools=openai_tools, tool_choice="auto")
+                response = await call_groq_api(client, messages, tools=OPENAI_TOOLS, tool_choice="auto")
                 
                 message_response = response["choices"][0]["message"]
                 
                 # Check if tool calls are needed
                 if message_response.get("tool_calls"):
-                    tool_results = []
-                    for tool_call in message_response["tool_calls"]:
-                        tool_name = tool_call["function"]["name"]
-                        tool_args = json.loads(tool_call["function"]["arguments"])
-                        
-                        # Find and execute the tool
-                        for tool in tools:
-                            if tool.name == tool_name:
-                                result = tool.invoke(tool_args)
-                                tool_results.append(f"{tool_name} result: {result}")
-                                break
+                    # Execute all requested tools concurrently
+                    results = await asyncio.gather(
+                        *(run_tool_call(tool_call) for tool_call in message_response["tool_calls"])
+                    )
+                    tool_results = [result for result in results if result is not None]
                     
                     # If we have tool results, send them to the LLM for a final response
                     if tool_results:
@@ -248,7 +422,7 @@ async def chat(request: ChatRequest):
                             {"role": "assistant", "content": "", "tool_calls": message_response["tool_calls"]},
                             {"role": "tool", "content": "\n".join(tool_results)}
                         ]
-                        final_response = call_groq_api(follow_up_messages)
+                        final_response = await call_groq_api(client, follow_up_messages)
                         return ChatResponse(
                             response=final_response["choices"][0]["message"]["content"], 
                             status="success"
@@ -260,17 +434,17 @@ async def chat(request: ChatRequest):
             except Exception as tool_error:
                 # If tool usage fails, fall back to regular response
                 print(f"Tool usage failed, falling back: {tool_error}")
-                response = get_fallback_response(message)
+                response = await get_fallback_response(client, message)
                 return ChatResponse(response=response, status="success")
         else:
             # Use direct response for general questions
-            response = get_fallback_response(message)
+            response = await get_fallback_response(client, message)
             return ChatResponse(response=response, status="success")
         
     except Exception as e:
         # If anything fails, use the fallback
         try:
-            fallback_response = get_fallback_response(message)
+            fallback_response = await get_fallback_response(client, message)
             return ChatResponse(response=fallback_response, status="success")
         except:
             return ChatResponse(
@@ -278,6 +452,39 @@ async def chat(request: ChatRequest):
                 status="error"
             )
 
+@app.post("/chat")
+async def chat(request: ChatRequest = Depends(decode_chat_request)):
+    """Main chat endpoint"""
+    return struct_response(await generate_chat_response(request))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest = Depends(decode_chat_request)):
+    """Stream a general answer as server-sent events (tools are not used)"""
+    if not GROQ_API_KEY:
+        raise HTTPException(status_code=500, detail="Groq API key not configured")
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    messages = build_fallback_messages(request.message)
+
+    async def event_stream():
+        try:
+            async for token in stream_groq_api(app.state.groq_client, messages):
+                yield f"data: {json.dumps({'content': token})}\n\n"
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            logging.error(f"Groq streaming error: {e}")
+            yield f"data: {json.dumps({'error': 'I apologize, but I am having trouble processing your question right now.'})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=False)
\ No newline at end of file
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+    )
@@ -1,31 +1,43 @@
 # app.py - Enhanced MCQ Generator with Groq API
-import json
-import re
-from typing import Dict, Any, List
-from fastapi import FastAPI, Query, HTTPException, Body
-from pydantic import BaseModel
+import orjson
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Union
+from fastapi import FastAPI, Query, HTTPException, Body, Depends
+from pydantic import BaseModel, ConfigDict, ValidationError
 import uvicorn
-import requests
 import os
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from llm_cache import cached_groq, stats as cache_stats, SAMPLED_TTL_SECONDS
+from semantic_cache import create_semantic_cache
+from groq_client import GROQ_API_KEY, post_completion, stream_completion, close_client
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="MCQ Generator API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_client()
 
-# Groq API Configuration
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+app = FastAPI(title="MCQ Generator API", version="1.0.0", lifespan=lifespan)
 
 # ✅ Fixed CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:8080","*"],  # allow all origins for now (change in prod)
+    allow_origins=[
+        "http://localhost:8080",
+        "https://frontend-app-278398219986.asia-south1.run.app",  # Frontend URL
+    ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
 # Request models
@@ -37,107 +49,330 @@ class QuizRequest(BaseModel):
     focus_areas: List[str] = []  # specific skills to focus on
     user_level: str = "intermediate"
 
-class MCQGeneratorAgent:
-    def __init__(self):
-        self.model = "llama-3.1-8b-instant"  # You can use "llama3-8b-8192" for faster responses
+# Response models (validated straight from the model's JSON reply)
+class LLMResponseModel(BaseModel):
+    # LLMs sometimes emit bare numbers where text is expected
+    model_config = ConfigDict(coerce_numbers_to_str=True)
 
-    def _call_groq_api(self, prompt: str) -> str:
-        """Call Groq API with the given prompt"""
-        if not GROQ_API_KEY:
-            raise Exception("Groq API key not configured")
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messages": [{"role": "user", "content": prompt}],
-            "model": self.model,
-            "temperature": 0.7,
-            "max_tokens": 6000,
-            "top_p": 0.9,
-            "stream": False
-        }
-        
-        try:
-            response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
-        except Exception as e:
-            raise Exception(f"Groq API error: {str(e)}")
+class QuizMetadata(LLMResponseModel):
+    topic: str
+    domain: str
+    difficulty: str
+    total_questions: int
+    estimated_time: str = ""
+
+class Question(LLMResponseModel):
+    id: int
+    question: str
+    options: Dict[str, str]
+    correct_answer: str
+    explanation: str = ""
+    skill_category: str = ""
+    difficulty_score: Union[int, float] = 0
 
-    def generate_mcqs(self, request: QuizRequest) -> Dict[str, Any]:
-        prompt = f"""
-        You are an expert educational content creator. Generate {request.num_questions} multiple-choice questions
-        for a skills assessment with the following specifications:
+class QuizResponse(LLMResponseModel):
+    quiz_metadata: QuizMetadata
+    questions: List[Question]
 
-        Topic: "{request.topic}"
-        Domain: "{request.domain}"
-        Difficulty Level: {request.difficulty}
-        User Level: {request.user_level}
-        Focus Areas: {', '.join(request.focus_areas) if request.focus_areas else 'General skills'}
+# Static instructions go in the system message and the per-request values in a short
+# user message after it, so every call shares a byte-identical prompt prefix that
+# Groq can cache server-side
+MCQ_SYSTEM_PROMPT = """
+        You are an expert educational content creator. Generate multiple-choice questions
+        for a skills assessment using the specifications given by the user
+        (number of questions, topic, domain, difficulty level, user level and focus areas).
 
         Requirements:
-        1. Exactly {request.num_questions} MCQs
+        1. Exactly the requested number of MCQs
         2. Each question should have 4 options (A, B, C, D)
-        3. Questions should be appropriate for {request.difficulty} level
+        3. Questions should be appropriate for the requested difficulty level
         4. Include practical, real-world scenarios
         5. Provide correct answer and detailed explanation for learning
-        6. Return ONLY valid JSON in this exact format:
-
-        {{
-            "quiz_metadata": {{
-                "topic": "{request.topic}",
-                "domain": "{request.domain}",
-                "difficulty": "{request.difficulty}",
-                "total_questions": {request.num_questions},
+        6. Return ONLY valid JSON in this exact format, with quiz_metadata filled in
+           from the specifications:
+
+        {
+            "quiz_metadata": {
+                "topic": "<topic>",
+                "domain": "<domain>",
+                "difficulty": "<difficulty level>",
+                "total_questions": <number of questions>,
                 "estimated_time": "15-20 minutes"
-            }},
+            },
             "questions": [
-                {{
+                {
                     "id": 1,
                     "question": "Question text here",
-                    "options": {{
+                    "options": {
                         "A": "Option A text",
                         "B": "Option B text",
                         "C": "Option C text",
                         "D": "Option D text"
-                    }},
+                    },
                     "correct_answer": "A",
                     "explanation": "Detailed explanation of why this is correct",
                     "skill_category": "Technical Skills",
                     "difficulty_score": 7
-                }}
+                }
             ]
-        }}
+        }
 
         Important: Return ONLY valid JSON, no other text or markdown formatting.
         """
 
+MCQ_USER_PROMPT_TEMPLATE = """Number of Questions: {num_questions}
+Topic: "{topic}"
+Domain: "{domain}"
+Difficulty Level: {difficulty}
+User Level: {user_level}
+Focus Areas: {focus_areas}"""
+
+def format_mcq_prompt(request: QuizRequest) -> str:
+    return MCQ_USER_PROMPT_TEMPLATE.format(
+        num_questions=request.num_questions,
+        topic=request.topic,
+        domain=request.domain,
+        difficulty=request.difficulty,
+        user_level=request.user_level,
+        focus_areas=', '.join(request.focus_areas) if request.focus_areas else 'General skills'
+    )
+
+# Common abbreviations folded onto one spelling so they share cache entries
+TOPIC_SYNONYMS = {
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "dl": "deep learning",
+    "k8s": "kubernetes",
+    "db": "database",
+    "dsa": "data structures and algorithms"
+}
+
+class PromptTemplateCache:
+    """
+    Caches generated quizzes by (prompt template, normalized variables).
+    num_questions is not part of the key: a cached quiz with at least as many
+    questions serves a smaller request by slicing its question list.
+    Quizzes are sampled (temperature 0.7), so like other sampled completions
+    they expire after ttl seconds and retakes get fresh questions.
+    """
+    def __init__(self, template: str, maxsize: int = 512, ttl: int = SAMPLED_TTL_SECONDS):
+        self.template_id = hashlib.sha256(template.encode()).hexdigest()[:16]
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        value = " ".join(value.lower().split())
+        return TOPIC_SYNONYMS.get(value, value)
+
+    def _key(self, request: QuizRequest):
+        focus_areas = tuple(sorted(self._normalize(area) for area in request.focus_areas))
+        return (
+            self.template_id,
+            self._normalize(request.topic),
+            self._normalize(request.domain),
+            request.difficulty.lower(),
+            request.user_level.lower(),
+            focus_areas
+        )
+
+    def get(self, request: QuizRequest) -> Optional[Dict[str, Any]]:
+        key = self._key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            quiz, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            if len(quiz["questions"]) < request.num_questions:
+                return None
+            self._entries.move_to_end(key)
+
+        result = dict(quiz)
+        result["questions"] = quiz["questions"][:request.num_questions]
+        result["quiz_metadata"] = {
+            **quiz.get("quiz_metadata", {}),
+            "topic": request.topic,
+            "domain": request.domain,
+            "total_questions": request.num_questions
+        }
+        return result
+
+    def put(self, request: QuizRequest, quiz: Dict[str, Any]) -> None:
+        key = self._key(request)
+        now = time.monotonic()
+        with self._lock:
+            existing = self._entries.get(key)
+            # Keep whichever live quiz can serve the most future requests
+            if (existing is None or existing[1] < now
+                    or len(quiz["questions"]) > len(existing[0]["questions"])):
+                self._entries[key] = (quiz, now + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+QUIZ_TEMPLATE_CACHE = PromptTemplateCache(MCQ_SYSTEM_PROMPT + MCQ_USER_PROMPT_TEMPLATE)
+
+# Near-duplicate quiz requests reuse a stored quiz (off unless SEMANTIC_CACHE_ENABLED=1).
+# The threshold is strict because a loose topic match would serve the wrong questions.
+QUIZ_SEMANTIC_CACHE = create_semantic_cache(threshold=0.97)
+
+@cached_groq
+async def request_groq_completion(payload: dict) -> str:
+    """POST a chat completion payload to Groq and return the message text"""
+    response = await post_completion(payload, timeout=60)
+    response.raise_for_status()
+    return orjson.loads(response.content)["choices"][0]["message"]["content"]
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` fence, if the model added one"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[7:] if text.startswith("```json") else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+class QuestionStreamParser:
+    """
+    Incrementally scans streamed quiz JSON and returns each object in the
+    "questions" array as soon as its closing brace arrives.
+    Tracks string/escape state so braces inside question text are ignored.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_questions = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        if self._finished:
+            return []
+        self._buffer += chunk
+        if not self._in_questions:
+            key = self._buffer.find('"questions"')
+            bracket = self._buffer.find("[", key) if key != -1 else -1
+            if bracket == -1:
+                return []
+            self._in_questions = True
+            self._pos = bracket + 1
+
+        questions = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    questions.append(orjson.loads(buffer[self._start:i + 1]))
+            elif char == "]" and self._depth == 0:
+                self._finished = True
+                break
+        self._pos = len(buffer)
+        return questions
+
+class MCQGeneratorAgent:
+    def __init__(self):
+        self.model = "llama-3.1-8b-instant"  # You can use "llama3-8b-8192" for faster responses
+
+    def _build_payload(self, prompt: str, stream: bool = False, json_mode: bool = True,
+                       system_prompt: Optional[str] = MCQ_SYSTEM_PROMPT) -> dict:
+        if not GROQ_API_KEY:
+            raise Exception("Groq API key not configured")
+
+        messages = [{"role": "user", "content": prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        payload = {
+            "messages": messages,
+            "model": self.model,
+            "temperature": 0.7,
+            "max_tokens": 6000,
+            "top_p": 0.9,
+            "stream": stream
+        }
+        if json_mode:
+            # Groq guarantees a bare JSON object (no fences or prose); the prompt must mention JSON
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    async def _call_groq_api(self, prompt: str, json_mode: bool = True,
+                             system_prompt: Optional[str] = MCQ_SYSTEM_PROMPT,
+                             validate=None, use_cache: bool = True) -> str:
+        """
+        Call Groq API with the given prompt (sent after the MCQ system prompt by default).
+        Replies are only cached once validate (if given) accepts them.
+        """
+        payload = self._build_payload(prompt, json_mode=json_mode, system_prompt=system_prompt)
+        
+        try:
+            return await request_groq_completion(payload, validate=validate, use_cache=use_cache)
+        except Exception as e:
+            raise Exception(f"Groq API error: {str(e)}")
+
+    async def generate_mcqs(self, request: QuizRequest) -> Dict[str, Any]:
+        prompt = format_mcq_prompt(request)
+
+        cached_quiz = QUIZ_TEMPLATE_CACHE.get(request)
+        if cached_quiz is not None:
+            return cached_quiz
+
+        # Exact-match fields go in the scope; only the free-text fields are compared semantically
+        semantic_scope = f"quiz:{request.difficulty}:{request.user_level}:{request.num_questions}"
+        semantic_text = f"{request.topic} | {request.domain} | {', '.join(request.focus_areas)}"
+
         try:
-            raw_text = self._call_groq_api(prompt)
-
-            # ✅ Clean unwanted markdown fences (```json ... ```)
-            clean_text = re.sub(r"^```(?:json)?", "", raw_text)
-            clean_text = re.sub(r"```$", "", clean_text).strip()
-
-            # Parse JSON
-            quiz_data = json.loads(clean_text)
-            
-            # Validate the structure
-            if "questions" not in quiz_data:
-                raise ValueError("Generated JSON missing 'questions' field")
-                
+            cached_text = await QUIZ_SEMANTIC_CACHE.lookup(semantic_scope, semantic_text) if QUIZ_SEMANTIC_CACHE else None
+            raw_text = cached_text or await self._call_groq_api(prompt, validate=QuizResponse.model_validate_json)
+
+            # Parse and validate the structure in one pass
+            quiz_data = QuizResponse.model_validate_json(raw_text).model_dump()
+
             if len(quiz_data["questions"]) != request.num_questions:
                 print(f"Warning: Requested {request.num_questions} questions, got {len(quiz_data['questions'])}")
 
+            if cached_text is not None:
+                # A semantic hit carries the original request's metadata; relabel a copy
+                quiz_data = {
+                    **quiz_data,
+                    "quiz_metadata": {**quiz_data["quiz_metadata"], "topic": request.topic, "domain": request.domain}
+                }
+
+            QUIZ_TEMPLATE_CACHE.put(request, quiz_data)
+
+            if QUIZ_SEMANTIC_CACHE and cached_text is None:
+                await QUIZ_SEMANTIC_CACHE.add(semantic_scope, semantic_text, raw_text)
+
             return quiz_data
 
-        except json.JSONDecodeError as je:
+        except ValidationError as ve:
             raise HTTPException(
                 status_code=500,
-                detail=f"Failed to parse generated quiz JSON: {str(je)}\nRaw response: {raw_text[:500]}..."
+                detail=f"Failed to parse generated quiz JSON: {str(ve)}\nRaw response: {raw_text[:500]}..."
             )
         except Exception as e:
             raise HTTPException(
@@ -145,9 +380,49 @@ class MCQGeneratorAgent:
                 detail=f"Quiz generation failed: {str(e)}"
             )
 
+    async def stream_mcqs(self, request: QuizRequest):
+        """
+        Yield NDJSON lines: one {"question": ...} per MCQ as soon as it is complete,
+        then a final {"quiz_metadata": ...} line (or {"error": ...} on failure)
+        """
+        cached_quiz = QUIZ_TEMPLATE_CACHE.get(request)
+        if cached_quiz is not None:
+            for question in cached_quiz["questions"]:
+                yield orjson.dumps({"question": question}) + b"\n"
+            yield orjson.dumps({"quiz_metadata": cached_quiz["quiz_metadata"]}) + b"\n"
+            return
+
+        prompt = format_mcq_prompt(request)
+        parser = QuestionStreamParser()
+        chunks = []
+        try:
+            async for chunk in stream_completion(self._build_payload(prompt, stream=True, json_mode=False)):
+                chunks.append(chunk)
+                for question in parser.feed(chunk):
+                    question = Question.model_validate(question).model_dump()
+                    yield orjson.dumps({"question": question}) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"error": f"Quiz generation failed: {str(e)}"}) + b"\n"
+            return
+
+        # The complete response also carries the metadata and feeds the template cache
+        try:
+            # JSON mode is unavailable when streaming, so the reply may still be fenced
+            quiz_data = QuizResponse.model_validate_json(strip_code_fences("".join(chunks))).model_dump()
+            QUIZ_TEMPLATE_CACHE.put(request, quiz_data)
+            yield orjson.dumps({"quiz_metadata": quiz_data["quiz_metadata"]}) + b"\n"
+        except ValidationError as e:
+            yield orjson.dumps({"error": f"Failed to parse generated quiz JSON: {str(e)}"}) + b"\n"
+
+# One agent serves every request
+_AGENT = MCQGeneratorAgent()
+
+def get_agent() -> MCQGeneratorAgent:
+    return _AGENT
+
 # ---------------- Endpoints ----------------
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "MCQ Generator API for Skills Assessment 🚀",
         "version": "1.0.0",
@@ -157,17 +432,24 @@ def root():
             "/": "Base endpoint",
             "/generate": "Generate MCQs (GET with query params)",
             "/generate-quiz": "Generate MCQs (POST with detailed request)",
-            "/health": "Health check"
+            "/generate-quiz/stream": "Generate MCQs streamed as NDJSON, one question per line",
+            "/health": "Health check",
+            "/cache/stats": "Groq response cache hit/miss counters"
         }
     }
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of this worker's Groq response caches"""
+    return dict(cache_stats)
+
 @app.get("/health")
-def health_check():
+async def health_check(agent: MCQGeneratorAgent = Depends(get_agent)):
     try:
         # Test Groq API connection
-        agent = MCQGeneratorAgent()
         test_prompt = "Say 'Hello World'"
-        response = agent._call_groq_api(test_prompt)
+        # Uncached so the check really reaches Groq
+        response = await agent._call_groq_api(test_prompt, json_mode=False, system_prompt=None, use_cache=False)
         
         return {
             "status": "healthy", 
@@ -185,41 +467,58 @@ def health_check():
         }
 
 @app.get("/generate")
-def generate_legacy(
+async def generate_legacy(
     topic: str = Query(..., description="Quiz topic"),
     domain: str = Query(..., description="Subject domain"),
     num_questions: int = Query(10, description="Number of questions"),
-    difficulty: str = Query("intermediate", description="Difficulty level")
+    difficulty: str = Query("intermediate", description="Difficulty level"),
+    agent: MCQGeneratorAgent = Depends(get_agent)
 ):
-    agent = MCQGeneratorAgent()
     request = QuizRequest(
         topic=topic,
         domain=domain,
         num_questions=num_questions,
         difficulty=difficulty
     )
-    return agent.generate_mcqs(request)
+    return await agent.generate_mcqs(request)
 
 @app.post("/generate-quiz")
-def generate_quiz_detailed(request: QuizRequest):
+async def generate_quiz_detailed(request: QuizRequest, agent: MCQGeneratorAgent = Depends(get_agent)):
     """Generate MCQs with detailed request body"""
-    agent = MCQGeneratorAgent()
-    return agent.generate_mcqs(request)
+    return await agent.generate_mcqs(request)
+
+@app.post("/generate-quiz/stream")
+async def generate_quiz_stream(request: QuizRequest, agent: MCQGeneratorAgent = Depends(get_agent)):
+    """Stream MCQs as NDJSON so clients can render each question as it arrives"""
+    return StreamingResponse(agent.stream_mcqs(request), media_type="application/x-ndjson")
 
 @app.post("/generate")
-def generate_legacy_post(
+async def generate_legacy_post(
     topic: str = Query(..., description="Quiz topic"),
     domain: str = Query(..., description="Subject domain"),
-    num_questions: int = Query(10, description="Number of questions")
+    num_questions: int = Query(10, description="Number of questions"),
+    agent: MCQGeneratorAgent = Depends(get_agent)
 ):
-    agent = MCQGeneratorAgent()
     request = QuizRequest(
         topic=topic,
         domain=domain,
         num_questions=num_questions
     )
-    return agent.generate_mcqs(request)
+    return await agent.generate_mcqs(request)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    if os.getenv("DEBUG") == "1":
+        # Auto-reload only works with a single process
+        uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
+    else:
+        # Each worker has its own in-memory caches (exact-match without REDIS_URL,
+        # quiz templates); the semantic cache is shared through its SQLite file
+        uvicorn.run(
+            "app:app",
+            host="0.0.0.0",
+            port=port,
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+            loop="uvloop",
+            http="httptools",
+        )
\ No newline at end of file
@@ -1,9 +1,20 @@
 # main.py
 from fastapi import FastAPI, UploadFile, HTTPException
-import shutil, json
-from resume_parser import extract_text_from_pdf, ask_llm, get_parse_prompt, get_score_prompt, get_recommend_prompt
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from groq_client import close_client
+from llm_cache import stats as cache_stats
+from resume_parser import extract_text_from_pdf, analyze_resume_text
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_client()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,37 +45,34 @@ app.add_middleware(
 
 
 
-def safe_json_loads(s: str):
-    try:
-        return json.loads(s)
-    except Exception:
-        import re
-        match = re.search(r"\{.*\}", s, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(0))
-            except:
-                return {"error": "invalid_json", "raw": s}
-        return {"error": "empty_or_invalid", "raw": s}
-
 @app.get("/")
 def root():
     return {
         "message": "Welcome to the Resume Analyzer API 📄🚀",
         "endpoints": {
-            "/analyze_resume/": "Upload a resume to analyze"
+            "/analyze_resume/": "Upload a resume to analyze",
+            "/cache/stats": "Groq response cache hit/miss counters"
         }
     }
 
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of this worker's Groq response caches"""
+    return dict(cache_stats)
+
 @app.post("/analyze_resume/")
 async def analyze_resume(file: UploadFile):
+    file_location = None
     try:
-        # Save uploaded resume locally
-        with open(file.filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream the upload to a uniquely named temp file
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as buffer:
+            file_location = buffer.name
+            while chunk := await file.read(1 << 16):
+                buffer.write(chunk)
 
-        # Extract text
-        resume_text = extract_text_from_pdf(file.filename)
+        # Extract text (CPU-bound, so off the event loop)
+        resume_text = await asyncio.to_thread(extract_text_from_pdf, file_location)
 
         # Default job description
         default_job_description = """
@@ -76,18 +84,12 @@ async def analyze_resume(file: UploadFile):
         - Professional experience in relevant field
         """
 
-        # Stage 1: Parse
-        parsed_resume = ask_llm(get_parse_prompt(resume_text))
-
-        # Stage 2: ATS Score
-        ats_score = ask_llm(get_score_prompt(parsed_resume))
-
-        # Stage 3: Recommendations
-        recommendations = ask_llm(get_recommend_prompt(parsed_resume))
+        # Parse, ATS score and recommendations in one combined call
+        analysis = await analyze_resume_text(resume_text)
 
         return {
-            "ats_score": safe_json_loads(ats_score),
-            "recommendations": safe_json_loads(recommendations)
+            "ats_score": analysis["scores"],
+            "recommendations": analysis["recommendations"]
         }
 
     except Exception as e:
@@ -95,3 +97,6 @@ async def analyze_resume(file: UploadFile):
         print("ERROR:", e)
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal Error: {str(e)}")
+    finally:
+        if file_location:
+            os.remove(file_location)
@@ -1,81 +1,213 @@
 # resume_parser.py
 import pdfplumber
-import os
-import json
-import requests
+import pypdfium2 as pdfium
+import orjson
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
 from dotenv import load_dotenv
+from llm_cache import cached_groq
+from groq_client import GROQ_API_KEY, post_completion
 
 # Load environment variables
 load_dotenv()
 
-# Groq API Configuration
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 
-def call_groq_api(prompt: str, model: str = "llama-3.1-8b-instant") -> str:
-    """Call Groq API with the given prompt"""
+@cached_groq
+async def request_groq_completion(payload: dict) -> str:
+    """POST a chat completion payload to Groq and return the message text"""
+    response = await post_completion(payload)
+    response.raise_for_status()
+    return orjson.loads(response.content)["choices"][0]["message"]["content"]
+
+async def call_groq_api(prompt: str, model: str = "llama-3.1-8b-instant",
+                        max_tokens: int = 1024, json_mode: bool = False,
+                        system_prompt: str = None, validate=None) -> str:
+    """
+    Call Groq API with the given prompt (json_mode makes Groq guarantee a JSON object reply).
+    Replies are only cached once validate (if given) accepts them.
+    """
     if not GROQ_API_KEY:
         raise Exception("Groq API key not configured")
     
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+    messages = [{"role": "user", "content": prompt}]
+    if system_prompt:
+        messages.insert(0, {"role": "system", "content": system_prompt})
     payload = {
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "model": model,
         "temperature": 0.7,
-        "max_tokens": 1024,
+        "max_tokens": max_tokens,
         "top_p": 0.9,
         "stream": False
     }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
     
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        return await request_groq_completion(payload, validate=validate)
     except Exception as e:
         raise Exception(f"Groq API error: {str(e)}")
 
-def extract_text_from_pdf(path: str) -> str:
-    """Extract text from PDF using pdfplumber"""
+def _extract_with_pdfium(path: str) -> str:
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+    finally:
+        pdf.close()
+
+def _extract_with_pdfplumber(path: str) -> str:
     text = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text.append(page_text)
+    return "\n".join(text)
+
+def extract_text_from_pdf(path: str) -> str:
+    """
+    Extract text from PDF using PDFium (fast, native), falling back to
+    pdfplumber when PDFium fails or finds no text
+    """
     try:
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text.append(page_text)
-        return "\n".join(text)
+        text = _extract_with_pdfium(path)
+        if text.strip():
+            return text
+    except Exception as e:
+        print(f"PDFium extraction failed, falling back to pdfplumber: {e}")
+    try:
+        return _extract_with_pdfplumber(path)
     except Exception as e:
         raise Exception(f"PDF extraction error: {str(e)}")
 
-def ask_llm(prompt: str) -> str:
+async def ask_llm(prompt: str) -> str:
     """Send prompt to Groq LLM"""
-    return call_groq_api(prompt)
+    return await call_groq_api(prompt)
 
-def clean_json_response(response: str) -> dict:
-    """Clean and parse JSON response from LLM"""
-    try:
-        # Remove markdown code blocks if present
-        response = response.strip()
-        if response.startswith("```json"):
-            response = response[7:]
-        elif response.startswith("```"):
-            response = response[3:]
-        
-        if response.endswith("```"):
-            response = response[:-3]
-        
-        return json.loads(response.strip())
-    except json.JSONDecodeError as e:
-        raise Exception(f"Failed to parse JSON response: {e}\nResponse was: {response}")
+# Response models: JSON-mode replies are parsed and validated in one pass
+class LLMResponseModel(BaseModel):
+    # LLMs sometimes emit bare numbers where text is expected (phone numbers, years)
+    model_config = ConfigDict(coerce_numbers_to_str=True)
 
-def get_parse_prompt(resume_text: str) -> str:
-    return f"""
+class Contact(LLMResponseModel):
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    linkedin: Optional[str] = None
+
+class Experience(LLMResponseModel):
+    title: Optional[str] = None
+    company: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    # Often a list of bullet points rather than one paragraph
+    description: Optional[Union[str, List[str]]] = None
+
+class Education(LLMResponseModel):
+    degree: Optional[str] = None
+    field: Optional[str] = None
+    institution: Optional[str] = None
+    year: Optional[str] = None
+
+class ResumeParsed(LLMResponseModel):
+    # Lenient on purpose: LLMs return null for missing sections, group skills by
+    # category, or flatten entries to strings, and none of that should fail a request
+    name: Optional[str] = None
+    contact: Optional[Contact] = None
+    skills: Any = []
+    experience: Optional[List[Union[Experience, str]]] = []
+    education: Optional[List[Union[Education, str]]] = []
+    projects: Optional[List[Union[str, Dict[str, Any]]]] = []
+    certifications: Optional[List[Union[str, Dict[str, Any]]]] = []
+
+Score = Union[int, float]
+
+# Component weights from the scoring prompts
+SCORE_WEIGHTS = {
+    "skill_score": 0.40,
+    "experience_score": 0.20,
+    "title_score": 0.15,
+    "education_score": 0.10,
+    "format_score": 0.10,
+    "language_score": 0.05,
+}
+
+class ResumeScore(LLMResponseModel):
+    # LLMs sometimes drop a score or send null; keep whatever scores did come back
+    skill_score: Optional[Score] = None
+    experience_score: Optional[Score] = None
+    title_score: Optional[Score] = None
+    education_score: Optional[Score] = None
+    format_score: Optional[Score] = None
+    language_score: Optional[Score] = None
+    total_score: Optional[Score] = None
+
+    @model_validator(mode="after")
+    def fill_total_score(self):
+        """Derive a missing total from the component scores present, reweighted"""
+        if self.total_score is None:
+            present = {field: getattr(self, field) for field in SCORE_WEIGHTS if getattr(self, field) is not None}
+            if not present:
+                raise ValueError("reply contains no scores")
+            weight = sum(SCORE_WEIGHTS[field] for field in present)
+            self.total_score = round(sum(score * SCORE_WEIGHTS[field] for field, score in present.items()) / weight, 1)
+        return self
+
+class ResumeRecommendations(LLMResponseModel):
+    missing_skills: List[str] = []
+    improved_bullets: List[str] = []
+    recommendations: List[str] = []
+    summary: str = ""
+
+class ResumeAnalysis(LLMResponseModel):
+    parsed_resume: ResumeParsed
+    scores: ResumeScore
+    recommendations: ResumeRecommendations
+
+# Prompt size drives Groq latency, so only the fields the scoring/recommendation
+# prompts use are sent, with long text and lists capped
+PROMPT_RESUME_FIELDS = ("name", "skills", "experience", "education", "projects", "certifications")
+MAX_LIST_ITEMS = 10
+MAX_DESCRIPTION_CHARS = 300
+MAX_PROMPT_CHARS = 8000
+
+def _shrink_value(value, max_chars: int = MAX_DESCRIPTION_CHARS):
+    if isinstance(value, str):
+        return " ".join(value.split())[:max_chars].rstrip()
+    if isinstance(value, list):
+        return [_shrink_value(item, max_chars) for item in value[:MAX_LIST_ITEMS]]
+    if isinstance(value, dict):
+        return {key: _shrink_value(item, max_chars) for key, item in value.items()}
+    return value
+
+def shrink_resume_json(resume_json: dict) -> dict:
+    """Keep only the key resume fields, with whitespace collapsed, text capped and lists capped"""
+    return {
+        field: _shrink_value(resume_json[field])
+        for field in PROMPT_RESUME_FIELDS
+        if resume_json.get(field)
+    }
+
+def resume_prompt_json(resume_json: Union[dict, str]) -> str:
+    """
+    Serialize a parsed resume compactly for a prompt, truncating past MAX_PROMPT_CHARS.
+    A string (an unparseable parse reply) is passed through as-is.
+    """
+    if isinstance(resume_json, str):
+        text = resume_json.strip()
+    else:
+        text = orjson.dumps(shrink_resume_json(resume_json)).decode()
+    if len(text) > MAX_PROMPT_CHARS:
+        logging.warning(f"Resume JSON is {len(text)} chars; truncating to {MAX_PROMPT_CHARS} for the prompt")
+        text = text[:MAX_PROMPT_CHARS]
+    return text
+
+# Each prompt is a static system message (byte-identical across calls, so Groq can
+# cache the prefix) followed by a user message carrying only the resume
+PARSE_SYSTEM_PROMPT = """
 You are an expert resume parser.
-Extract structured data from the following resume and return valid JSON ONLY.
+Extract structured data from the resume given by the user and return valid JSON ONLY.
 
 Required fields:
 - "name" (string)
@@ -87,19 +219,12 @@ Required fields:
 - "certifications" (array of strings)
 
 Important: Return ONLY valid JSON, no other text.
-
-Resume:
-{resume_text[:3000]}  # Limit text to avoid token limits
 """
 
-def get_score_prompt(resume_json: str) -> str:
-    return f"""
+SCORE_SYSTEM_PROMPT = """
 You are an Applicant Tracking System (ATS).
 
-Resume JSON:
-{resume_json}
-
-Score the resume (0–100) with these weights:
+Score the resume JSON given by the user (0–100) with these weights:
 - Skills match (40%)
 - Experience relevance (20%)
 - Title/role alignment (15%)
@@ -108,7 +233,7 @@ Score the resume (0–100) with these weights:
 - Language/grammar (5%)
 
 Return JSON ONLY with these exact fields:
-{{
+{
   "skill_score": number,
   "experience_score": number,
   "title_score": number,
@@ -116,53 +241,188 @@ Return JSON ONLY with these exact fields:
   "format_score": number,
   "language_score": number,
   "total_score": number
-}}
+}
 
 Important: Return ONLY valid JSON, no other text.
 """
 
-def get_recommend_prompt(resume_json: str) -> str:
-    return f"""
+RECOMMEND_SYSTEM_PROMPT = """
 You are a professional resume coach.
-
-Resume JSON: {resume_json}
+Review the resume JSON given by the user.
 
 Return JSON ONLY with these exact fields:
-{{
+{
   "missing_skills": array of strings,
   "improved_bullets": array of strings,
   "recommendations": array of strings,
   "summary": string
-}}
+}
 
 Important: Return ONLY valid JSON, no other text.
 """
 
-def parse_resume(resume_text: str) -> dict:
-    """Parse resume text into structured JSON"""
+# Parse, score and recommend in a single generation
+ANALYZE_SYSTEM_PROMPT = """
+You are an expert resume parser, an Applicant Tracking System (ATS) and a professional resume coach.
+Analyze the resume given by the user and return ONE JSON object with exactly these three keys:
+
+"parsed_resume": an object with
+- "name" (string)
+- "contact" (object with email, phone, linkedin)
+- "skills" (array of strings)
+- "experience" (array of objects with title, company, start_date, end_date, description)
+- "education" (array of objects with degree, field, institution, year)
+- "projects" (array of strings)
+- "certifications" (array of strings)
+
+"scores": the ATS score (0–100) of the resume with these weights:
+- Skills match (40%)
+- Experience relevance (20%)
+- Title/role alignment (15%)
+- Education/certs (10%)
+- Formatting/parseability (10%)
+- Language/grammar (5%)
+as an object with these exact number fields:
+skill_score, experience_score, title_score, education_score, format_score, language_score, total_score
+
+"recommendations": an object with these exact fields:
+{
+  "missing_skills": array of strings,
+  "improved_bullets": array of strings,
+  "recommendations": array of strings,
+  "summary": string
+}
+
+Important: Return ONLY valid JSON, no other text.
+"""
+
+# The fused answer covers all three sections, so it needs a larger output budget
+ANALYZE_MAX_TOKENS = 3072
+
+# Resume text is capped to keep the parse prompt within token limits
+MAX_RESUME_TEXT_CHARS = 3000
+
+def get_parse_prompt(resume_text: str) -> str:
+    return f"Resume:\n{resume_text[:MAX_RESUME_TEXT_CHARS]}"
+
+def get_score_prompt(resume_json: str) -> str:
+    return f"Resume JSON:\n{resume_json}"
+
+def get_recommend_prompt(resume_json: str) -> str:
+    return f"Resume JSON:\n{resume_json}"
+
+def get_analyze_prompt(resume_text: str) -> str:
+    return get_parse_prompt(resume_text)
+
+async def request_parse(resume_text: str) -> str:
+    """Ask Groq to parse resume text, returning the raw reply (cached only if it validates)"""
     prompt = get_parse_prompt(resume_text)
-    response = ask_llm(prompt)
-    return clean_json_response(response)
+    return await call_groq_api(
+        prompt, json_mode=True, system_prompt=PARSE_SYSTEM_PROMPT, validate=ResumeParsed.model_validate_json
+    )
 
-def score_resume(resume_json: dict) -> dict:
+async def parse_resume(resume_text: str) -> dict:
+    """Parse resume text into structured JSON"""
+    response = await request_parse(resume_text)
+    return ResumeParsed.model_validate_json(response).model_dump()
+
+async def score_resume(resume_json: Union[dict, str]) -> dict:
     """Score resume for ATS compatibility"""
-    prompt = get_score_prompt(json.dumps(resume_json, indent=2))
-    response = ask_llm(prompt)
-    return clean_json_response(response)
+    prompt = get_score_prompt(resume_prompt_json(resume_json))
+    response = await call_groq_api(
+        prompt, json_mode=True, system_prompt=SCORE_SYSTEM_PROMPT, validate=ResumeScore.model_validate_json
+    )
+    return ResumeScore.model_validate_json(response).model_dump()
 
-def recommend_improvements(resume_json: dict) -> dict:
+async def recommend_improvements(resume_json: Union[dict, str]) -> dict:
     """Get recommendations for resume improvement"""
-    prompt = get_recommend_prompt(json.dumps(resume_json, indent=2))
-    response = ask_llm(prompt)
-    return clean_json_response(response)
+    prompt = get_recommend_prompt(resume_prompt_json(resume_json))
+    response = await call_groq_api(
+        prompt, json_mode=True, system_prompt=RECOMMEND_SYSTEM_PROMPT,
+        validate=ResumeRecommendations.model_validate_json
+    )
+    return ResumeRecommendations.model_validate_json(response).model_dump()
 
-def analyze_resume_pdf(pdf_path: str) -> dict:
+async def parse_stage(resume_text: str) -> tuple:
+    """
+    Parse resume text, returning the parsed resume and what the score/recommend
+    prompts should use: the parsed resume, or the raw reply if it fails validation
+    """
+    raw_parse = await request_parse(resume_text)
+    try:
+        parsed_resume = ResumeParsed.model_validate_json(raw_parse).model_dump()
+        return parsed_resume, parsed_resume
+    except ValidationError as e:
+        # Scoring and recommending can still work from the raw reply, so don't fail the request
+        logging.warning(f"Parsed resume failed validation, scoring the raw reply instead: {e}")
+        return {"error": str(e), "raw": raw_parse}, raw_parse
+
+async def complete_stages(prompt_resume: Union[dict, str], scores: Optional[dict] = None,
+                          recommendations: Optional[dict] = None) -> tuple:
+    """Run the score and/or recommend stages concurrently for whichever result is missing"""
+    stages = {}
+    if scores is None:
+        stages["scores"] = score_resume(prompt_resume)
+    if recommendations is None:
+        stages["recommendations"] = recommend_improvements(prompt_resume)
+    results = dict(zip(stages, await asyncio.gather(*stages.values(), return_exceptions=True)))
+
+    # A failed stage is reported in place instead of discarding the other result
+    for stage, result in results.items():
+        if isinstance(result, Exception):
+            results[stage] = {"error": str(result)}
+    return results.get("scores", scores), results.get("recommendations", recommendations)
+
+async def analyze_resume_staged(resume_text: str) -> dict:
+    """Parse, then score and recommend concurrently, using one Groq call per stage"""
+    parsed_resume, prompt_resume = await parse_stage(resume_text)
+    # Score and recommend only depend on the parsed resume, so run them together
+    scores, recommendations = await complete_stages(prompt_resume)
+    return {"parsed_resume": parsed_resume, "scores": scores, "recommendations": recommendations}
+
+def validate_section(model, analysis: dict, section: str) -> Optional[dict]:
+    """One section of the fused answer validated against its model, or None if it doesn't fit"""
+    try:
+        return model.model_validate(analysis.get(section)).model_dump()
+    except ValidationError as e:
+        logging.warning(f"Combined analysis section {section!r} failed validation, redoing that stage: {e}")
+        return None
+
+async def analyze_resume_text(resume_text: str) -> dict:
+    """
+    Parse, score and recommend in one JSON-mode Groq call.
+    Sections of the fused answer that fail validation are redone with their
+    staged call; the valid sections are kept.
+    """
+    try:
+        response = await call_groq_api(
+            get_analyze_prompt(resume_text), max_tokens=ANALYZE_MAX_TOKENS, json_mode=True,
+            system_prompt=ANALYZE_SYSTEM_PROMPT, validate=ResumeAnalysis.model_validate_json
+        )
+        analysis = orjson.loads(response)
+        if not isinstance(analysis, dict):
+            raise ValueError("reply is not a JSON object")
+    except Exception as e:
+        logging.warning(f"Combined analysis failed, falling back to staged calls: {e}")
+        return await analyze_resume_staged(resume_text)
+
+    parsed_resume = validate_section(ResumeParsed, analysis, "parsed_resume")
+    scores = validate_section(ResumeScore, analysis, "scores")
+    recommendations = validate_section(ResumeRecommendations, analysis, "recommendations")
+
+    if parsed_resume is None:
+        parsed_resume, prompt_resume = await parse_stage(resume_text)
+    else:
+        prompt_resume = parsed_resume
+    scores, recommendations = await complete_stages(prompt_resume, scores, recommendations)
+    return {"parsed_resume": parsed_resume, "scores": scores, "recommendations": recommendations}
+
+async def analyze_resume_pdf(pdf_path: str) -> dict:
     """
     Complete resume analysis pipeline:
     1. Extract text from PDF
-    2. Parse into structured data
-    3. Score for ATS
-    4. Get improvement recommendations
+    2. Parse into structured data, score for ATS and get improvement
+       recommendations (one combined LLM call)
     """
     try:
         # Step 1: Extract text
@@ -172,23 +432,15 @@ def analyze_resume_pdf(pdf_path: str) -> dict:
         if not resume_text.strip():
             raise Exception("No text could be extracted from the PDF")
         
-        # Step 2: Parse resume
-        print("🔍 Parsing resume structure...")
-        parsed_resume = parse_resume(resume_text)
-        
-        # Step 3: Score resume
-        print("📊 Scoring resume for ATS...")
-        scores = score_resume(parsed_resume)
-        
-        # Step 4: Get recommendations
-        print("💡 Generating recommendations...")
-        recommendations = recommend_improvements(parsed_resume)
+        # Step 2: Parse, score and recommend
+        print("🔍 Parsing, 📊 scoring and 💡 generating recommendations...")
+        analysis = await analyze_resume_text(resume_text)
         
         return {
             "success": True,
-            "parsed_resume": parsed_resume,
-            "scores": scores,
-            "recommendations": recommendations,
+            "parsed_resume": analysis["parsed_resume"],
+            "scores": analysis["scores"],
+            "recommendations": analysis["recommendations"],
             "text_preview": resume_text[:500] + "..." if len(resume_text) > 500 else resume_text
         }
         
@@ -202,5 +454,5 @@ def analyze_resume_pdf(pdf_path: str) -> dict:
 if __name__ == "__main__":
     # Test the parser
     pdf_path = "sample_resume.pdf"  # Replace with your PDF path
-    result = analyze_resume_pdf(pdf_path)
-    print(json.dumps(result, indent=2))
\ No newline at end of file
+    result = asyncio.run(analyze_resume_pdf(pdf_path))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
\ No newline at end of file
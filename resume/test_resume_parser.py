@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import orjson
+from pydantic import ValidationError
+
+import resume_parser
+from resume_parser import ResumeScore
+
+PARSED_RESUME = {"name": "Asha", "skills": ["Python", "SQL"]}
+RECOMMENDATIONS = {
+    "missing_skills": ["Docker"],
+    "improved_bullets": [],
+    "recommendations": ["Quantify impact"],
+    "summary": "Solid junior profile",
+}
+# language_score is missing and total_score is null, as LLMs sometimes reply
+PARTIAL_SCORES = {
+    "skill_score": 80,
+    "experience_score": 60,
+    "title_score": 70,
+    "education_score": 90,
+    "format_score": 50,
+    "total_score": None,
+}
+
+
+def reply(value) -> str:
+    return orjson.dumps(value).decode()
+
+
+class ResumeScoreTest(unittest.TestCase):
+    def test_partial_scores_are_kept(self):
+        scores = ResumeScore.model_validate_json(reply(PARTIAL_SCORES))
+        self.assertEqual(scores.skill_score, 80)
+        self.assertIsNone(scores.language_score)
+
+    def test_missing_total_is_derived_from_present_scores(self):
+        scores = ResumeScore.model_validate_json(reply(PARTIAL_SCORES))
+        # (80*.40 + 60*.20 + 70*.15 + 90*.10 + 50*.10) / .95
+        self.assertEqual(scores.total_score, 72.1)
+
+    def test_given_total_is_not_overwritten(self):
+        scores = ResumeScore.model_validate_json(reply({**PARTIAL_SCORES, "total_score": 75}))
+        self.assertEqual(scores.total_score, 75)
+
+    def test_reply_without_scores_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            ResumeScore.model_validate_json(reply({"total_score": None}))
+
+
+class AnalyzeResumeTextTest(unittest.TestCase):
+    def analyze(self, *replies):
+        with patch.object(resume_parser, "call_groq_api", AsyncMock(side_effect=replies)) as call:
+            analysis = asyncio.run(resume_parser.analyze_resume_text("Asha\nPython, SQL"))
+        return analysis, call
+
+    def test_fused_reply_with_partial_scores_needs_one_call(self):
+        analysis, call = self.analyze(reply({
+            "parsed_resume": PARSED_RESUME,
+            "scores": PARTIAL_SCORES,
+            "recommendations": RECOMMENDATIONS,
+        }))
+        self.assertEqual(call.await_count, 1)
+        self.assertEqual(analysis["scores"]["skill_score"], 80)
+        self.assertEqual(analysis["scores"]["total_score"], 72.1)
+        self.assertEqual(analysis["recommendations"]["summary"], "Solid junior profile")
+
+    def test_only_the_invalid_section_is_redone(self):
+        analysis, call = self.analyze(
+            reply({"parsed_resume": PARSED_RESUME, "scores": PARTIAL_SCORES, "recommendations": "n/a"}),
+            reply(RECOMMENDATIONS),
+        )
+        self.assertEqual(call.await_count, 2)
+        self.assertIs(call.await_args.kwargs["system_prompt"], resume_parser.RECOMMEND_SYSTEM_PROMPT)
+        self.assertEqual(analysis["parsed_resume"]["name"], "Asha")
+        self.assertEqual(analysis["recommendations"]["missing_skills"], ["Docker"])
+
+    def test_unusable_reply_falls_back_to_staged_calls(self):
+        analysis, call = self.analyze(
+            "not json", reply(PARSED_RESUME), reply(PARTIAL_SCORES), reply(RECOMMENDATIONS)
+        )
+        self.assertEqual(call.await_count, 4)
+        self.assertEqual(analysis["scores"]["total_score"], 72.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
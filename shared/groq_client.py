@@ -0,0 +1,108 @@
+# groq_client.py - Shared keep-alive connection pool for Groq chat completions
+# Canonical copy: shared/groq_client.py. Edit it there and run `python shared/sync.py`;
+# the per-service copies are overwritten.
+import os
+import httpx
+import orjson
+from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# Load environment variables
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# One pool per process so every call reuses warm TCP/TLS connections.
+# The transport retries failed connection attempts; HTTP errors are left to callers.
+client = httpx.AsyncClient(
+    timeout=30,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    ),
+)
+
+
+# Rate limits (429) and server errors (5xx) are retried; other 4xx are returned as-is
+GROQ_MAX_ATTEMPTS = 4
+MAX_RETRY_AFTER_SECONDS = 10
+
+
+class RetryableGroqError(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"Groq API returned {response.status_code}")
+        self.response = response
+        self.retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+
+def _parse_retry_after(value: str):
+    try:
+        return min(float(value), MAX_RETRY_AFTER_SECONDS)
+    except (TypeError, ValueError):
+        return None
+
+
+_backoff = wait_exponential_jitter(initial=0.5, max=4)
+
+
+def _retry_wait(retry_state) -> float:
+    """Wait as long as Groq's Retry-After asks, otherwise back off exponentially with jitter"""
+    error = retry_state.outcome.exception()
+    if isinstance(error, RetryableGroqError) and error.retry_after is not None:
+        return error.retry_after
+    return _backoff(retry_state)
+
+
+def groq_headers(api_key: str = None) -> dict:
+    return {
+        "Authorization": f"Bearer {api_key or GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+
+@retry(
+    stop=stop_after_attempt(GROQ_MAX_ATTEMPTS),
+    wait=_retry_wait,
+    retry=retry_if_exception_type(RetryableGroqError),
+    reraise=True,
+)
+async def _post_with_retry(api_url: str, headers: dict, body: bytes, timeout: float) -> httpx.Response:
+    response = await client.post(api_url, headers=headers, content=body, timeout=timeout)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableGroqError(response)
+    return response
+
+
+async def post_completion(payload: dict, api_key: str = None, api_url: str = GROQ_API_URL,
+                          timeout: float = 30) -> httpx.Response:
+    """
+    POST a chat completion payload to Groq and return the raw response,
+    retrying throttled and failed attempts before handing back the last one
+    """
+    try:
+        return await _post_with_retry(api_url, groq_headers(api_key), orjson.dumps(payload), timeout)
+    except RetryableGroqError as e:
+        return e.response
+
+
+async def stream_completion(payload: dict, timeout: float = 60):
+    """POST a streaming chat completion payload to Groq, yielding content deltas as they arrive"""
+    async with client.stream(
+        "POST", GROQ_API_URL, headers=groq_headers(), content=orjson.dumps(payload), timeout=timeout
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            content = orjson.loads(data)["choices"][0]["delta"].get("content")
+            if content:
+                yield content
+
+
+async def close_client():
+    await client.aclose()
@@ -0,0 +1,48 @@
+# sync.py - Copy the shared Groq modules into each service, or check the copies
+"""
+Each service is deployed from its own directory, so the shared modules are
+copied into it instead of being imported from here. After editing a module in
+shared/, run:
+
+    python shared/sync.py            # overwrite the service copies
+    python shared/sync.py --check    # exit 1 if any copy differs
+"""
+import sys
+from pathlib import Path
+
+SHARED = Path(__file__).resolve().parent
+ROOT = SHARED.parent
+
+# Service directory -> shared modules it uses
+SERVICES = {
+    "question": ("groq_client.py", "llm_cache.py", "semantic_cache.py"),
+    "resume": ("groq_client.py", "llm_cache.py"),
+    "skill_recommendation": ("groq_client.py", "llm_cache.py", "semantic_cache.py"),
+}
+
+
+def stale_copies() -> list:
+    """Service copies that are missing or differ from their shared module"""
+    stale = []
+    for service, modules in SERVICES.items():
+        for module in modules:
+            copy = ROOT / service / module
+            if not copy.exists() or copy.read_bytes() != (SHARED / module).read_bytes():
+                stale.append(copy)
+    return stale
+
+
+def main(check: bool) -> int:
+    stale = stale_copies()
+    for copy in stale:
+        relative = copy.relative_to(ROOT)
+        if check:
+            print(f"{relative} differs from shared/{copy.name}; run python shared/sync.py")
+        else:
+            copy.write_bytes((SHARED / copy.name).read_bytes())
+            print(f"Updated {relative}")
+    return 1 if check and stale else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(check="--check" in sys.argv[1:]))
@@ -0,0 +1,13 @@
+import unittest
+
+import sync
+
+
+class SharedModulesTest(unittest.TestCase):
+    def test_service_copies_match_shared_modules(self):
+        stale = [str(copy.relative_to(sync.ROOT)) for copy in sync.stale_copies()]
+        self.assertEqual(stale, [], "run python shared/sync.py")
+
+
+if __name__ == "__main__":
+    unittest.main()
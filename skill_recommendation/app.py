@@ -1,8 +1,20 @@
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
 from career_orchestrator import CareerOrchestrator, ResumeParser
+from groq_client import close_client
+from llm_cache import stats as cache_stats
 
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_client()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,28 +24,22 @@ app.add_middleware(
         "http://localhost:8080",
         "http://localhost:8081",
         "https://frontend-app-278398219986.asia-south1.run.app",  # Your frontend URL
-        "https://*.run.app",  # Allow all Cloud Run domains
-        "*"  # Allow all origins for development - remove in production
     ],
     allow_credentials=False,  # Set to False for broader compatibility
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD"],
-    allow_headers=[
-        "Accept",
-        "Accept-Language", 
-        "Content-Language",
-        "Content-Type",
-        "Authorization",
-        "X-Requested-With",
-        "Origin",
-        "Access-Control-Request-Method",
-        "Access-Control-Request-Headers"
-    ],
-    expose_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
-# Initialize orchestrator with your project + region
+# Shared across requests (the orchestrator's batcher only helps if requests share it)
 orchestrator = CareerOrchestrator()
 resume_parser = ResumeParser()
 
+def get_orchestrator() -> CareerOrchestrator:
+    return orchestrator
+
+def get_resume_parser() -> ResumeParser:
+    return resume_parser
+
 
 # -------------------------
 # Health Check
@@ -43,22 +49,44 @@ def health_check():
     return {"status": "Career Advisor API is running!"}
 
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of this worker's Groq response caches"""
+    return dict(cache_stats)
+
+
 # -------------------------
 # Upload Resume & Get Suggestions
 # -------------------------
 @app.post("/analyze-resume/")
-async def analyze_resume(file: UploadFile = File(...)):
+async def analyze_resume(
+    file: UploadFile = File(...),
+    orchestrator: CareerOrchestrator = Depends(get_orchestrator),
+    resume_parser: ResumeParser = Depends(get_resume_parser)
+):
+    # Reject unreadable formats up front; otherwise the extraction error text
+    # would be sent to Groq as if it were the resume
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if suffix not in ResumeParser.SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {suffix or 'unknown'}. "
+                   f"Upload one of: {', '.join(ResumeParser.SUPPORTED_EXTENSIONS)}"
+        )
+
+    file_location = None
     try:
-        # Save uploaded resume temporarily
-        file_location = f"/tmp/{file.filename}"
-        with open(file_location, "wb") as f:
-            f.write(await file.read())
+        # Stream the upload to a uniquely named temp file (keeping the extension for the parser)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+            file_location = f.name
+            while chunk := await file.read(1 << 16):
+                f.write(chunk)
 
         # Extract text
-        resume_text = resume_parser.extract(file_location)
+        resume_text = await asyncio.to_thread(resume_parser.extract, file_location)
 
         # Run orchestration
-        recommendations = orchestrator.run(resume_text)
+        recommendations = await orchestrator.run(resume_text)
 
         return {
             "resume_text": resume_text[:500],  # show preview only
@@ -66,15 +94,18 @@ async def analyze_resume(file: UploadFile = File(...)):
         }
     except Exception as e:
         return {"error": str(e)}
+    finally:
+        if file_location:
+            os.remove(file_location)
 
 
 # -------------------------
 # Analyze Raw Profile Text
 # -------------------------
 @app.post("/analyze-profile/")
-async def analyze_profile(profile_text: str):
+async def analyze_profile(profile_text: str, orchestrator: CareerOrchestrator = Depends(get_orchestrator)):
     try:
-        recommendations = orchestrator.run(profile_text)
+        recommendations = await orchestrator.run(profile_text)
         return {"recommendations": recommendations}
     except Exception as e:
         return {"error": str(e)}
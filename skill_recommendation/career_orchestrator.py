@@ -1,110 +1,273 @@
-import json
-import requests
+import orjson
+import httpx
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
+from llm_cache import cached_groq
+from semantic_cache import create_semantic_cache
+from groq_client import GROQ_API_KEY, GROQ_API_URL, post_completion
 
 # Load environment variables
 load_dotenv()
 
+# Profiles with near-identical skills and interests reuse stored career suggestions
+# (off unless SEMANTIC_CACHE_ENABLED=1). The threshold is strict because a loose
+# match would hand one student another student's suggestions.
+CAREER_SEMANTIC_CACHE = create_semantic_cache(threshold=0.97)
+
+
+def profile_cache_text(parsed_profile: dict):
+    """
+    Short, normalized text the career semantic cache compares: the parsed skills
+    and interests only, never the raw resume. None when there is nothing to compare.
+    """
+    def normalized(field):
+        values = parsed_profile.get(field)
+        if not isinstance(values, list):
+            return []
+        return sorted({" ".join(str(v).lower().split()) for v in values if v})
+
+    skills, interests = normalized("skills"), normalized("interests")
+    if not skills and not interests:
+        return None
+    return f"skills: {', '.join(skills)} | interests: {', '.join(interests)}"
+
+
+@cached_groq
+async def request_groq_completion(payload: dict, api_url: str, api_key: str) -> str:
+    """POST a chat completion payload to Groq and return the message text"""
+    logging.debug("Sending request to Groq API")
+    response = await post_completion(payload, api_key=api_key, api_url=api_url)
+    logging.debug(f"Groq response status: {response.status_code}")
+
+    if response.status_code == 401:
+        raise Exception("Invalid API key - Please check your GROQ_API_KEY")
+    elif response.status_code == 429:
+        raise Exception("Rate limit exceeded - Try again later")
+    elif response.status_code != 200:
+        raise Exception(f"API error {response.status_code}: {response.text}")
+
+    response.raise_for_status()
+    result = orjson.loads(response.content)
+    return result["choices"][0]["message"]["content"]
+
+
+def load_json_reply(response: str):
+    """Parse a JSON reply, tolerating a surrounding ```json fence"""
+    response = response.strip()
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.endswith("```"):
+        response = response[:-3]
+    return orjson.loads(response.strip())
+
+
+# ==================================================
+# Micro-batching for short independent prompts
+# ==================================================
+# Combined calls run in JSON mode under their own system prompt; each task's own
+# instructions travel inside its text so they don't conflict with the JSON format
+BATCH_SYSTEM_PROMPT = """
+        You solve several independent tasks given by the user. Each task starts with its
+        task id and carries its own instructions; follow them for that task only.
+
+        Return ONLY a JSON object whose keys are exactly the task ids and whose values
+        are the plain-text answer for that task, no other text.
+        """
+
+
+class GroqBatcher:
+    """
+    Coalesces prompts submitted within a short window into one JSON-mode Groq
+    call that answers them all as an object keyed by task id, then hands each
+    caller its result. A batch of one is sent on its own under system_prompt.
+    Falls back to one call per prompt if the combined answer can't be split.
+    """
+    def __init__(self, call, system_prompt: str, max_batch: int = 8, window: float = 0.05,
+                 tokens_per_task: int = 256):
+        self._call = call  # async (prompt, max_tokens, system_prompt=, json_mode=, validate=) -> str
+        self.system_prompt = system_prompt
+        self._instructions = " ".join(system_prompt.split())
+        self.max_batch = max_batch
+        self.window = window
+        self.tokens_per_task = tokens_per_task
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._flush_tasks = set()  # strong refs so in-flight flushes aren't garbage collected
+
+    async def submit(self, prompt: str) -> str:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Keep collecting the next batch while this one is in flight
+            task = asyncio.create_task(self._flush(batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, batch: list):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            if len(batch) == 1:
+                results = [await self._call_single(prompts[0])]
+            else:
+                results = await self._call_combined(prompts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _call_single(self, prompt: str) -> str:
+        return await self._call(prompt, self.tokens_per_task, system_prompt=self.system_prompt)
+
+    async def _call_combined(self, prompts: list) -> list:
+        task_ids = [f"task_{i + 1}" for i in range(len(prompts))]
+        tasks = "\n\n".join(
+            f"{task_id}:\nInstructions: {self._instructions}\n{prompt.strip()}"
+            for task_id, prompt in zip(task_ids, prompts)
+        )
+        combined_prompt = f"Task ids: {', '.join(task_ids)}\n\n{tasks}"
+
+        def split(response: str) -> list:
+            results = load_json_reply(response)
+            if not isinstance(results, dict) or set(results) != set(task_ids):
+                raise ValueError(f"expected keys {task_ids}, got {list(results) if isinstance(results, dict) else type(results).__name__}")
+            if not all(isinstance(results[task_id], str) for task_id in task_ids):
+                raise ValueError("batched results must all be strings")
+            return [results[task_id] for task_id in task_ids]
+
+        # Validating through the call keeps unsplittable replies out of the cache
+        response = await self._call(
+            combined_prompt, self.tokens_per_task * len(prompts),
+            system_prompt=BATCH_SYSTEM_PROMPT, json_mode=True, validate=split
+        )
+        try:
+            return split(response)
+        except Exception as e:
+            logging.warning(f"Batched response unusable, falling back to {len(prompts)} single calls: {e}")
+        return await asyncio.gather(*(self._call_single(prompt) for prompt in prompts))
+
+
 # ==================================================
 # Career Orchestrator (Groq API)
 # ==================================================
+# Static instructions live in system messages that are byte-identical across calls
+# (so Groq can cache the prefix); user messages carry only the per-request values
+PROFILE_SYSTEM_PROMPT = """
+        Extract key information from the student profile given by the user and return ONLY valid JSON.
+        Required keys: 
+        - "skills" (list of strings) 
+        - "academics" (string) 
+        - "interests" (list of strings)
+
+        Return ONLY JSON, no other text.
+        """
+
+CAREER_SYSTEM_PROMPT = """
+        You are a career counselor. Based on the student's profile given by the user, suggest 3 possible career paths. 
+        For each career, provide:
+        - "career_name"
+        - "required_skills" (list of 5–7 key skills)
+        - "reasoning" (why this fits the student)
+
+        Respond strictly in JSON array format.
+
+        Return ONLY JSON array, no other text.
+        """
+
+EXPLANATION_SYSTEM_PROMPT = """
+        You are a career counselor. Generate a personalized explanation for the career recommendation given by the user.
+
+        Provide a concise, encouraging explanation highlighting the alignment 
+        between the student's strengths and the required skills, and suggesting which skills to improve.
+
+        Keep it to 2-3 sentences maximum.
+        """
+
+
 class CareerOrchestrator:
     def __init__(self):
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.groq_api_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.groq_api_key = GROQ_API_KEY
+        self.groq_api_url = GROQ_API_URL
         self.model = "llama-3.1-8b-instant"
+        # Explanations are short and independent, so concurrent ones share a Groq call
+        self.explanation_batcher = GroqBatcher(self._call_groq_api, EXPLANATION_SYSTEM_PROMPT)
         
-    def _call_groq_api(self, prompt: str) -> str:
-        """Call Groq API with the given prompt"""
+    async def _call_groq_api(self, prompt: str, max_tokens: int = 1024, system_prompt: str = None,
+                             json_mode: bool = False, validate=None) -> str:
+        """
+        Call Groq API with the given prompt, after the system prompt if one is given.
+        json_mode makes Groq guarantee a JSON object reply.
+        Replies are only cached once validate (if given) accepts them.
+        """
         if not self.groq_api_key:
             raise Exception("Groq API key not configured")
-            
-        headers = {
-            "Authorization": f"Bearer {self.groq_api_key}",
-            "Content-Type": "application/json"
-        }
         
+        messages = [{"role": "user", "content": prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
         payload = {
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "model": self.model,
             "temperature": 0.7,
-            "max_tokens": 1024,
+            "max_tokens": max_tokens,
             "top_p": 0.9,
             "stream": False
         }
-        
-        print(f"📤 Sending request to Groq API...")
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
         
         try:
-            response = requests.post(self.groq_api_url, headers=headers, json=payload, timeout=30)
-            print(f"📥 Response status: {response.status_code}")
-            
-            if response.status_code == 401:
-                raise Exception("Invalid API key - Please check your GROQ_API_KEY")
-            elif response.status_code == 429:
-                raise Exception("Rate limit exceeded - Try again later")
-            elif response.status_code != 200:
-                raise Exception(f"API error {response.status_code}: {response.text}")
-                
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-            
-        except requests.exceptions.RequestException as e:
+            return await request_groq_completion(
+                payload, self.groq_api_url, self.groq_api_key, validate=validate
+            )
+        except httpx.HTTPError as e:
             raise Exception(f"Groq API request failed: {str(e)}")
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
 
     # ... rest of your methods remain the same ...
-    def _parse_student_profile(self, text: str) -> dict:
-        prompt = f"""
-        Extract key information from the following student profile and return ONLY valid JSON.
-        Required keys: 
-        - "skills" (list of strings) 
-        - "academics" (string) 
-        - "interests" (list of strings)
-
-        Profile Text: {text}
-
-        Return ONLY JSON, no other text.
-        """
-        response = self._call_groq_api(prompt)
+    async def _parse_student_profile(self, text: str) -> dict:
+        prompt = f"Profile Text: {text}"
+        response = await self._call_groq_api(prompt, system_prompt=PROFILE_SYSTEM_PROMPT, validate=load_json_reply)
         try:
-            # Clean the response to ensure it's valid JSON
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            return json.loads(response.strip())
+            return load_json_reply(response)
         except Exception as e:
             print(f"Error parsing profile JSON: {e}")
             return {"skills": [], "academics": None, "interests": []}
 
-    def _generate_career_suggestions(self, student_profile_text: str) -> list:
-        prompt = f"""
-        You are a career counselor. Based on the student's profile below, suggest 3 possible career paths. 
-        For each career, provide:
-        - "career_name"
-        - "required_skills" (list of 5–7 key skills)
-        - "reasoning" (why this fits the student)
-
-        Respond strictly in JSON array format.
-
-        Profile: {student_profile_text}
-
-        Return ONLY JSON array, no other text.
-        """
-        response = self._call_groq_api(prompt)
+    async def _generate_career_suggestions(self, student_profile_text: str, parsed_profile: dict) -> list:
+        prompt = f"Profile: {student_profile_text}"
+        semantic_text = profile_cache_text(parsed_profile) if CAREER_SEMANTIC_CACHE else None
+        cached = await CAREER_SEMANTIC_CACHE.lookup("career", semantic_text) if semantic_text else None
+        response = cached or await self._call_groq_api(
+            prompt, system_prompt=CAREER_SYSTEM_PROMPT, validate=load_json_reply
+        )
         try:
-            # Clean the response to ensure it's valid JSON
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            return json.loads(response.strip())
+            suggestions = load_json_reply(response)
+            if semantic_text and cached is None:
+                await CAREER_SEMANTIC_CACHE.add("career", semantic_text, response)
+            return suggestions
         except Exception as e:
             print(f"Error parsing career suggestions JSON: {e}")
             return [
@@ -115,31 +278,25 @@ class CareerOrchestrator:
                 }
             ]
 
-    def _generate_explanation(self, recommendation: dict, student_profile: dict) -> str:
-        prompt = f"""
-        You are a career counselor. Generate a personalized explanation for the following career recommendation.
-
-        Recommendation: {recommendation['career_name']}
-        Student profile strengths: {', '.join(student_profile.get('skills', []))}
-        Suggested required skills: {', '.join(recommendation.get('required_skills', []))}
+    async def _generate_explanation(self, recommendation: dict, student_profile: dict) -> str:
+        prompt = f"""Recommendation: {recommendation['career_name']}
+Student profile strengths: {', '.join(student_profile.get('skills', []))}
+Suggested required skills: {', '.join(recommendation.get('required_skills', []))}"""
+        return await self.explanation_batcher.submit(prompt)
 
-        Provide a concise, encouraging explanation highlighting the alignment 
-        and suggesting which skills to improve.
-
-        Keep it to 2-3 sentences maximum.
-        """
-        return self._call_groq_api(prompt)
-
-    def run(self, student_profile_text: str):
+    async def run(self, student_profile_text: str):
         # Step 1: Parse profile
-        parsed_profile = self._parse_student_profile(student_profile_text)
+        parsed_profile = await self._parse_student_profile(student_profile_text)
 
         # Step 2: Get career suggestions from Groq
-        suggestions = self._generate_career_suggestions(student_profile_text)
+        suggestions = await self._generate_career_suggestions(student_profile_text, parsed_profile)
 
-        # Step 3: Add explanations
-        for s in suggestions:
-            s["explanation"] = self._generate_explanation(s, parsed_profile)
+        # Step 3: Add explanations (independent, so requested together and batched by explanation_batcher)
+        explanations = await asyncio.gather(
+            *(self._generate_explanation(s, parsed_profile) for s in suggestions)
+        )
+        for s, explanation in zip(suggestions, explanations):
+            s["explanation"] = explanation
 
         return suggestions
 
@@ -147,15 +304,39 @@ class CareerOrchestrator:
 # ==================================================
 # Resume Parser
 # ==================================================
-import textract
+import docx
+import pypdfium2 as pdfium
 
 class ResumeParser:
     """
-    Extracts text from resume files (.pdf, .docx, etc.)
+    Extracts text from resume files (.pdf, .docx, .txt) in-process
     """
+    SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+    def _extract_pdf(self, file_path: str) -> str:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+        finally:
+            pdf.close()
+
+    def _extract_docx(self, file_path: str) -> str:
+        return "\n".join(paragraph.text for paragraph in docx.Document(file_path).paragraphs)
+
+    def _extract_txt(self, file_path: str) -> str:
+        with open(file_path, encoding="utf-8", errors="ignore") as f:
+            return f.read()
+
     def extract(self, file_path: str) -> str:
+        extractors = {
+            ".pdf": self._extract_pdf,
+            ".docx": self._extract_docx,
+            ".txt": self._extract_txt,
+        }
         try:
-            text = textract.process(file_path).decode("utf-8")
-            return text.strip()
+            ext = os.path.splitext(file_path)[1].lower()
+            if ext not in self.SUPPORTED_EXTENSIONS:
+                raise ValueError(f"Unsupported file type: {ext or 'unknown'}")
+            return extractors[ext](file_path).strip()
         except Exception as e:
             return f"Error extracting resume: {e}"
\ No newline at end of file
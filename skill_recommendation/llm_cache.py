@@ -0,0 +1,129 @@
+# llm_cache.py - Exact-match response cache for Groq completions
+# Canonical copy: shared/llm_cache.py. Edit it there and run `python shared/sync.py`;
+# the per-service copies are overwritten.
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Optional, Protocol
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # Redis is optional - the in-memory cache is used without it
+    redis = None
+
+# Sampled completions (temperature > 0) are only reused for a short while
+DETERMINISTIC_TTL_SECONDS = 86400
+SAMPLED_TTL_SECONDS = 300
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str, ttl: int) -> None: ...
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class RedisCache:
+    """Redis-backed cache shared by every process of a deployment"""
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self._client.get(key)
+            return value.decode() if value is not None else None
+        except redis.RedisError as e:
+            logging.warning(f"Redis get failed: {e}")
+            return None
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        try:
+            await self._client.setex(key, ttl, value)
+        except redis.RedisError as e:
+            logging.warning(f"Redis set failed: {e}")
+
+
+def _default_backend() -> CacheBackend:
+    redis_url = os.getenv("REDIS_URL")
+    if redis and redis_url:
+        return RedisCache(redis_url)
+    return MemoryCache()
+
+
+backend: CacheBackend = _default_backend()
+stats = {"hits": 0, "misses": 0}
+
+
+async def cache_get(key: str) -> Optional[str]:
+    return await backend.get(key)
+
+
+async def cache_set(key: str, value: str, ttl: int) -> None:
+    await backend.set(key, value, ttl)
+
+
+def cache_key(payload: dict) -> str:
+    """Hash everything that affects the completion (streaming does not)"""
+    fields = {k: v for k, v in payload.items() if k != "stream"}
+    return "groq:" + hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+def cached_groq(fn):
+    """
+    Cache an async function that sends a Groq payload and returns the completion text.
+    Callers may pass validate= (a callable that raises on an unusable reply) so a
+    malformed completion is never stored, and use_cache=False to always reach Groq.
+    """
+    @wraps(fn)
+    async def wrapper(payload: dict, *args, validate: Optional[Callable[[str], Any]] = None,
+                      use_cache: bool = True, **kwargs) -> str:
+        if not use_cache:
+            return await fn(payload, *args, **kwargs)
+
+        key = cache_key(payload)
+        cached = await cache_get(key)
+        if cached is not None:
+            stats["hits"] += 1
+            return cached
+
+        stats["misses"] += 1
+        content = await fn(payload, *args, **kwargs)
+        if validate is not None:
+            try:
+                validate(content)
+            except Exception as e:
+                logging.warning(f"Not caching Groq reply that failed validation: {e}")
+                return content
+        ttl = DETERMINISTIC_TTL_SECONDS if payload.get("temperature") == 0 else SAMPLED_TTL_SECONDS
+        await cache_set(key, content, ttl)
+        return content
+    return wrapper
@@ -0,0 +1,131 @@
+# semantic_cache.py - Opt-in cache serving stored Groq completions for near-duplicate inputs
+# Canonical copy: shared/semantic_cache.py. Edit it there and run `python shared/sync.py`;
+# the per-service copies are overwritten.
+import os
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+from llm_cache import stats
+
+try:
+    import numpy as np
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Semantic caching is optional and off unless these are installed
+    faiss = None
+    SentenceTransformer = None
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_DB = os.getenv("SEMANTIC_CACHE_DB", "semantic_cache.sqlite3")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Reported next to the exact-match counters in /cache/stats
+stats["semantic_hits"] = 0
+
+
+class SemanticCache:
+    """
+    Serves stored completions for near-duplicate inputs.
+    Texts are compared by cosine similarity of normalized sentence embeddings;
+    entries only match within the same scope, which callers use for fields
+    that must match exactly. Entries persist in SQLite across restarts.
+    Embedding is CPU-bound, so lookups and inserts run in a worker thread.
+
+    Each uvicorn worker holds its own index over the shared database and pulls
+    in rows written by other workers before every lookup. Cache failures are
+    logged and treated as misses; they never fail the request being served.
+    """
+
+    def __init__(self, threshold: float, db_path: str = SEMANTIC_CACHE_DB):
+        self.threshold = threshold
+        self._model = SentenceTransformer(EMBEDDING_MODEL)
+        self._dimension = self._model.get_sentence_embedding_dimension()
+        self._scopes = {}  # scope -> (faiss index, responses in index order)
+        self._last_id = 0  # highest row id already in the index
+        self._lock = threading.Lock()
+        # Several workers share the file: WAL lets readers proceed during a write,
+        # and the timeout waits out another worker's lock instead of failing at once
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache "
+            "(id INTEGER PRIMARY KEY, scope TEXT, vector BLOB, response TEXT)"
+        )
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        """Index rows added since the last sync, including other workers' rows (caller holds _lock)"""
+        for row_id, scope, vector, response in self._db.execute(
+            "SELECT id, scope, vector, response FROM semantic_cache WHERE id > ? ORDER BY id",
+            (self._last_id,),
+        ):
+            self._add_to_index(scope, self._from_blob(vector), response)
+            self._last_id = row_id
+
+    def _embed(self, text: str):
+        return self._model.encode([text], normalize_embeddings=True).astype("float32")
+
+    def _from_blob(self, blob: bytes):
+        return np.frombuffer(blob, dtype="float32").reshape(1, self._dimension)
+
+    def _add_to_index(self, scope: str, vector, response: str):
+        if scope not in self._scopes:
+            self._scopes[scope] = (faiss.IndexFlatIP(self._dimension), [])
+        index, responses = self._scopes[scope]
+        index.add(vector)
+        responses.append(response)
+
+    async def lookup(self, scope: str, text: str) -> Optional[str]:
+        try:
+            return await asyncio.to_thread(self._lookup, scope, text)
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed, treating as a miss: {e}")
+            return None
+
+    async def add(self, scope: str, text: str, response: str) -> None:
+        try:
+            await asyncio.to_thread(self._add, scope, text, response)
+        except Exception as e:
+            logging.warning(f"Semantic cache write failed, response not cached: {e}")
+
+    def _lookup(self, scope: str, text: str) -> Optional[str]:
+        vector = self._embed(text)
+        with self._lock:
+            self._sync()
+            if scope not in self._scopes:
+                return None
+            index, responses = self._scopes[scope]
+            scores, ids = index.search(vector, 1)
+            if ids[0][0] >= 0 and scores[0][0] >= self.threshold:
+                stats["semantic_hits"] += 1
+                return responses[ids[0][0]]
+        return None
+
+    def _add(self, scope: str, text: str, response: str) -> None:
+        vector = self._embed(text)
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT INTO semantic_cache (scope, vector, response) VALUES (?, ?, ?)",
+                    (scope, vector.tobytes(), response),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                raise
+            # Picks up this row along with any other workers wrote in the meantime
+            self._sync()
+
+
+def create_semantic_cache(threshold: float) -> Optional[SemanticCache]:
+    """Return a SemanticCache when SEMANTIC_CACHE_ENABLED=1 and its dependencies are installed"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if faiss is None:
+        logging.warning("SEMANTIC_CACHE_ENABLED is set but faiss/sentence-transformers are not installed")
+        return None
+    return SemanticCache(threshold)